@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from models import db, User, Achievement
+
+# depends_on: campos do usuário ou eventos que podem disparar a regra.
+# O bit é fixo para sempre: nunca reutilize nem renumere bits de regras existentes.
+AchievementRule = namedtuple('AchievementRule', ['bit', 'title', 'description', 'icon', 'depends_on', 'cond'])
+
+RULES = [
+    AchievementRule(0, "Primeiros Passos", "1ª atividade concluída.", "flag", {'total_activities'}, lambda u, ctx: u.total_activities >= 1),
+    AchievementRule(1, "Estudante Dedicado", "100 pontos XP.", "star", {'score'}, lambda u, ctx: u.score >= 100),
+    AchievementRule(2, "Mestre", "Nível Avançado alcançado.", "trophy", {'level'}, lambda u, ctx: u.level == 'Avançado'),
+    AchievementRule(3, "Imparável", "20 questões respondidas.", "target", {'total_activities'}, lambda u, ctx: u.total_activities >= 20),
+    AchievementRule(4, "Maratonista", "50 questões respondidas.", "zap", {'total_activities'}, lambda u, ctx: u.total_activities >= 50),
+    AchievementRule(5, "Lendário", "Acumulou 1000 pontos XP.", "crown", {'score'}, lambda u, ctx: u.score >= 1000),
+    AchievementRule(6, "Na Mosca!", "Acertou 100% em uma rodada.", "crosshair", {'round'}, lambda u, ctx: ctx.get('round_accuracy') is not None and ctx['round_accuracy'] >= 99.9),
+    AchievementRule(7, "Membro VIP", "Tornou-se um assinante Premium.", "gem", {'is_premium'}, lambda u, ctx: bool(u.is_premium)),
+]
+
+
+class AchievementEngine:
+    """Registro declarativo de conquistas, montado uma vez na inicialização.
+
+    Cada avaliação recebe o que mudou (campos/eventos) e roda só as regras afetadas;
+    o conjunto já obtido vem de User.badges_mask, sem consultar a tabela achievements.
+    """
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda r: r.bit)
+        self.by_title = {r.title: r for r in self.rules}
+        self.by_dependency = {}
+        for r in self.rules:
+            for dep in r.depends_on:
+                self.by_dependency.setdefault(dep, []).append(r)
+
+    def affected(self, changed=None):
+        """Regras que dependem de algo em `changed` (None = todas)."""
+        if changed is None: return self.rules
+        bits = {r.bit: r for dep in changed for r in self.by_dependency.get(dep, [])}
+        return [bits[b] for b in sorted(bits)]
+
+    def earned_mask(self, user):
+        if user.badges_mask is None:
+            # Usuário anterior ao bitset: sincroniza uma única vez a partir das linhas existentes
+            titles = {title for (title,) in db.session.query(Achievement.title).filter_by(user_id=user.id)}
+            user.badges_mask = sum(1 << r.bit for r in self.rules if r.title in titles)
+        return user.badges_mask
+
+    def evaluate(self, user, changed=None, **context):
+        """Concede as conquistas recém-obtidas (sem commit). Retorna os títulos novos."""
+        return self._grant(user, self.affected(changed), context)
+
+    def _grant(self, user, rules, context):
+        if not rules: return []
+        synced = user.badges_mask is not None
+        mask = self.earned_mask(user)
+        new = []
+        for r in rules:
+            if mask & (1 << r.bit) or not r.cond(user, context): continue
+            db.session.add(Achievement(user_id=user.id, title=r.title, description=r.description, icon_name=r.icon))
+            mask |= 1 << r.bit
+            new.append(r.title)
+        if new or not synced:
+            # OR no próprio UPDATE: não apaga bits gravados por outra requisição depois da leitura
+            user.badges_mask = db.func.coalesce(User.badges_mask, 0).op('|')(mask)
+        if new: user.bump_data_version()
+        return new
+
+    def backfill(self, rules=None, batch_size=500):
+        """Avalia regras (por padrão, todas) para todos os usuários, em lotes com um commit por lote."""
+        selected = [self.by_title[t] for t in rules] if rules else self.rules
+        last_id, granted = 0, 0
+        while True:
+            users = User.query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not users: break
+            for u in users:
+                granted += len(self._grant(u, selected, {}))
+            db.session.commit()
+            last_id = users[-1].id
+        return granted
+
+
+achievement_engine = AchievementEngine(RULES)
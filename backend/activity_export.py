@@ -0,0 +1,174 @@
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+
+from models import db, Question, UserActivity
+
+FIELDS = ('id', 'user_id', 'question_id', 'user_answer', 'is_correct', 'timestamp',
+          'question_topic', 'question_difficulty', 'correct_answer')
+FORMATS = ('csv', 'jsonl', 'parquet')
+EXTENSIONS = {'csv': '.csv.gz', 'jsonl': '.jsonl.gz', 'parquet': '.parquet'}
+
+def pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def last_activity_id():
+    return db.session.query(db.func.max(UserActivity.id)).scalar() or 0
+
+def iter_activity_chunks(after_id=0, until_id=None, since=None, chunk_size=5000):
+    """Lê user_activities + questions em ordem de id, em listas de até chunk_size linhas.
+
+    yield_per liga stream_results: no Postgres é um cursor nomeado (server-side), então só
+    um bloco fica em memória, seja qual for o tamanho da tabela. Só colunas (sem entidades
+    ORM), para nada acumular no identity map da sessão.
+    """
+    stmt = db.select(
+        UserActivity.id, UserActivity.user_id, UserActivity.question_id, UserActivity.user_answer,
+        UserActivity.is_correct, UserActivity.timestamp,
+        Question.topic, Question.difficulty, Question.correct_answer,
+    ).join(Question, UserActivity.question_id == Question.id) \
+        .where(UserActivity.id > after_id).order_by(UserActivity.id)
+    if until_id is not None: stmt = stmt.where(UserActivity.id <= until_id)
+    if since is not None: stmt = stmt.where(UserActivity.timestamp >= since)
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield [tuple(r) for r in rows]
+
+
+def _value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+def csv_text(rows, header=False):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    if header: w.writerow(FIELDS)
+    w.writerows([_value(v) for v in r] for r in rows)
+    return buf.getvalue()
+
+def jsonl_text(rows):
+    return ''.join(json.dumps(dict(zip(FIELDS, map(_value, r))), ensure_ascii=False) + '\n' for r in rows)
+
+
+def gzip_stream(chunks, fmt):
+    """Gera o export como um único gzip em pedaços (para respostas HTTP em stream)."""
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+    first = True
+    for rows in chunks:
+        text = csv_text(rows, header=first) if fmt == 'csv' else jsonl_text(rows)
+        first = False
+        data = z.compress(text.encode())
+        if data: yield data
+    if first and fmt == 'csv': yield z.compress(csv_text([], header=True).encode())
+    yield z.flush()
+
+
+class _GzipTextFile:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.f = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        if fmt == 'csv': self.f.write(csv_text([], header=True))
+
+    def write(self, rows):
+        self.f.write(csv_text(rows) if self.fmt == 'csv' else jsonl_text(rows))
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetFile:
+    """Um row group por bloco lido do banco (pyarrow só é importado aqui)."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()), ('user_id', pa.int64()), ('question_id', pa.int64()), ('user_answer', pa.string()),
+            ('is_correct', pa.bool_()), ('timestamp', pa.timestamp('us')), ('question_topic', pa.string()),
+            ('question_difficulty', pa.string()), ('correct_answer', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(col, type=f.type) for col, f in zip(columns, self.schema)], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class ExportState:
+    """Progresso do export em <dir>/export_state.json: último id exportado e arquivos gerados.
+
+    Gravado só depois que um arquivo é fechado e renomeado, então um export interrompido
+    recomeça do último arquivo completo, sem linhas duplicadas nem faltando.
+    """
+
+    NAME = 'export_state.json'
+
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, self.NAME)
+        self.data = {'last_id': 0, 'rows': 0, 'files': []}
+        if os.path.exists(self.path):
+            with open(self.path) as f: self.data.update(json.load(f))
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f: json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def export_to_dir(out_dir, fmt='csv', chunk_size=5000, rows_per_file=1_000_000, since=None, restart=False):
+    """Exporta as atividades novas desde o último export para arquivos em out_dir.
+
+    Cada arquivo cobre uma faixa de ids (activities_<primeiro>_<último><ext>). O limite
+    superior é fixado no início, para o export não perseguir inserts que chegam durante ele.
+    """
+    if fmt not in FORMATS: raise ValueError(f"Formato inválido: {fmt}")
+    if fmt == 'parquet' and not pyarrow_available():
+        raise RuntimeError("Formato parquet requer o pacote pyarrow.")
+    os.makedirs(out_dir, exist_ok=True)
+    state = ExportState(out_dir)
+    if restart: state.data = {'last_id': 0, 'rows': 0, 'files': []}
+    after_id, until_id = state.data['last_id'], last_activity_id()
+    print(f"📤 Exportando atividades {after_id + 1}..{until_id} ({fmt}) para {out_dir}")
+
+    written, out, tmp, first_id, in_file, last_id = 0, None, None, None, 0, after_id
+
+    def close_file():
+        out.close()
+        name = f"activities_{first_id}_{last_id}{EXTENSIONS[fmt]}"
+        os.replace(tmp, os.path.join(out_dir, name))
+        state.data['last_id'] = last_id
+        state.data['rows'] += in_file
+        state.data['files'].append({'name': name, 'rows': in_file, 'exported_at': datetime.utcnow().isoformat()})
+        state.save()
+        print(f"   💾 {name} ({in_file} linhas)")
+
+    for rows in iter_activity_chunks(after_id, until_id, since, chunk_size):
+        while rows:
+            if out is None:
+                tmp = os.path.join(out_dir, f".activities_{rows[0][0]}.partial")
+                out = _ParquetFile(tmp) if fmt == 'parquet' else _GzipTextFile(tmp, fmt)
+                first_id, in_file = rows[0][0], 0
+            part, rows = rows[:rows_per_file - in_file], rows[rows_per_file - in_file:]
+            out.write(part)
+            in_file += len(part)
+            written += len(part)
+            last_id = part[-1][0]
+            if in_file >= rows_per_file:
+                close_file()
+                out = None
+    if out is not None: close_file()
+    if until_id > state.data['last_id']:
+        # Linhas filtradas por `since` no fim da faixa: já foram percorridas, avança o checkpoint
+        state.data['last_id'] = until_id
+        state.save()
+    return {'rows': written, 'last_id': state.data['last_id'], 'total_rows': state.data['rows']}
@@ -0,0 +1,239 @@
+import importlib.util
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metrics import metrics
+
+def pymongo_available():
+    return importlib.util.find_spec('pymongo') is not None
+
+
+def mongo_collection_factory(uri, db_name, collection_name):
+    """Cria a coleção do datalake sob demanda (reconecta sozinho depois de uma queda).
+
+    O PyMongo só é importado aqui, na thread de envio, nunca no import do app.
+    """
+    def factory():
+        from pymongo import MongoClient
+        client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+        client.server_info()  # Força conexão para testar
+        return client[db_name][collection_name]
+    return factory
+
+def _encode(o):
+    if isinstance(o, datetime): return {'$date': o.isoformat()}
+    raise TypeError(f"Tipo não serializável: {type(o)}")
+
+def _decode(d):
+    if len(d) == 1 and '$date' in d: return datetime.fromisoformat(d['$date'])
+    return d
+
+
+class ActivityLogShipper:
+    """Envia os logs de atividade ao MongoDB em background, fora do caminho da requisição.
+
+    Fila limitada em memória, lotes por tamanho ou tempo, retry com backoff. Se o Mongo
+    estiver fora ou a fila encher, os logs vão para um spool local (JSONL, append-only)
+    que é reenviado quando o Mongo voltar.
+    """
+
+    def __init__(self, collection_factory=None, spool_path='activity_logs.spool.jsonl', max_queue=10000,
+                 batch_size=200, flush_interval=2.0, max_retries=3, backoff=0.5, cooldown=30.0):
+        self.collection_factory = collection_factory
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.enabled = collection_factory is not None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._collection = None
+        self._down_until = 0.0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=100)
+        self.counters = {'enqueued': 0, 'shipped': 0, 'spilled': 0, 'overflowed': 0, 'replayed': 0, 'dropped': 0, 'failures': 0}
+
+    def init_app(self, app):
+        c = app.config
+        if not c.get('ACTIVITY_LOG_ENABLED', True) or not pymongo_available():
+            self.enabled = False
+            print("ℹ️ Logs do MongoDB desativados (PyMongo ausente ou ACTIVITY_LOG_ENABLED=0).")
+            return
+        if self.collection_factory is None:
+            self.collection_factory = mongo_collection_factory(c['MONGO_URI'], 'upwise_datalake', 'activity_logs')
+        self.spool_path = c.get('ACTIVITY_LOG_SPOOL_PATH', self.spool_path)
+        self.batch_size = c.get('ACTIVITY_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = c.get('ACTIVITY_LOG_FLUSH_INTERVAL', self.flush_interval)
+        self._queue = queue.Queue(maxsize=c.get('ACTIVITY_LOG_MAX_QUEUE', self._queue.maxsize))
+        self.enabled = True
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.counters[key] += n
+
+    def ship(self, docs):
+        """Enfileira os logs sem bloquear; o que não couber na fila vai direto para o spool."""
+        if not self.enabled or not docs: return
+        self._ensure_started()
+        overflow = []
+        for doc in docs:
+            try:
+                self._queue.put_nowait(doc)
+                self._count('enqueued')
+            except queue.Full:
+                overflow.append(doc)
+        if overflow:
+            self._count('overflowed', len(overflow))
+            self._spill(overflow)
+
+    def resume_spool(self):
+        """Reenvia o spool deixado por uma execução anterior (inclusive um .replaying interrompido).
+
+        Chamado pelo servidor (serve.py) ao subir; nunca no init_app, para migrações e scripts de
+        linha de comando não conectarem ao Mongo. Sem isso, o primeiro ship() também retoma o envio.
+        """
+        if self.enabled and self._spooled(): self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None: return
+        with self._start_lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._run, name='activity-log-shipper', daemon=True)
+            self._thread.start()
+
+    # --- Loop de background ---
+
+    def _spooled(self):
+        return os.path.exists(self.spool_path) or os.path.exists(self.spool_path + '.replaying')
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch: self._flush(batch)
+            if self._spooled() and time.monotonic() >= self._down_until:
+                self._replay_spool()
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0: break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, docs):
+        if self._collection is None: self._collection = self.collection_factory()
+        start = time.perf_counter()
+        # insert_many altera os dicts (adiciona _id); manda cópias para poder reenviar
+        with metrics.timer(metrics.mongo):
+            self._collection.insert_many([dict(d) for d in docs])
+        with self._stats_lock:
+            self._latencies.append(time.perf_counter() - start)
+
+    def _flush(self, batch):
+        if time.monotonic() < self._down_until:
+            self._spill(batch)
+            return
+        for attempt in range(self.max_retries):
+            try:
+                self._insert(batch)
+                self._count('shipped', len(batch))
+                return
+            except Exception as e:
+                self._collection = None
+                self._count('failures')
+                if attempt == self.max_retries - 1:
+                    print(f"⚠️ MongoDB indisponível ({e}). {len(batch)} logs enviados para o spool local.")
+                else:
+                    time.sleep(self.backoff * (2 ** attempt))
+        self._down_until = time.monotonic() + self.cooldown
+        self._spill(batch)
+
+    def _spill(self, docs):
+        try:
+            with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as f:
+                for d in docs:
+                    f.write(json.dumps(d, default=_encode, ensure_ascii=False) + '\n')
+            self._count('spilled', len(docs))
+        except Exception as e:
+            print(f"❌ Falha ao gravar spool de logs ({e}). {len(docs)} logs perdidos.")
+            self._count('dropped', len(docs))
+
+    def _spool_batches(self, f):
+        """Gera (docs, linhas) do spool em lotes de batch_size, lendo linha a linha."""
+        docs, lines = [], []
+        for line in f:
+            if not line.strip(): continue
+            try:
+                docs.append(json.loads(line, object_hook=_decode))
+            except json.JSONDecodeError:
+                # Linha truncada por uma queda no meio da escrita
+                self._count('dropped')
+                continue
+            lines.append(line)
+            if len(docs) >= self.batch_size:
+                yield docs, lines
+                docs, lines = [], []
+        if docs: yield docs, lines
+
+    def _replay_spool(self):
+        """Reenvia o spool ao Mongo; o que falhar volta para o spool.
+
+        Um .replaying que sobrou de uma execução interrompida é reenviado antes do spool novo.
+        """
+        replaying = self.spool_path + '.replaying'
+        with self._spool_lock:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spool_path): return
+                os.replace(self.spool_path, replaying)
+
+        replayed = 0
+        with open(replaying, encoding='utf-8') as f:
+            for docs, lines in self._spool_batches(f):
+                try:
+                    self._insert(docs)
+                except Exception:
+                    self._collection = None
+                    self._down_until = time.monotonic() + self.cooldown
+                    with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as out:
+                        out.writelines(lines)
+                        # Resto do arquivo, linha a linha (a última pode ter sido truncada sem '\n')
+                        for line in f:
+                            if line.strip(): out.write(line if line.endswith('\n') else line + '\n')
+                    break
+                replayed += len(docs)
+                self._count('replayed', len(docs))
+        os.remove(replaying)
+        if replayed: print(f"📊 {replayed} logs do spool reenviados ao MongoDB.")
+
+    def stats(self):
+        with self._stats_lock:
+            lat = list(self._latencies)
+            counters = dict(self.counters)
+        spool_bytes = 0
+        for path in (self.spool_path, self.spool_path + '.replaying'):
+            if os.path.exists(path): spool_bytes += os.path.getsize(path)
+        return {
+            'enabled': self.enabled,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'mongo_available': time.monotonic() >= self._down_until,
+            'spool_bytes': spool_bytes,
+            'flush_latency_avg_ms': round(sum(lat) / len(lat) * 1000, 2) if lat else None,
+            'flush_latency_last_ms': round(lat[-1] * 1000, 2) if lat else None,
+            **counters,
+        }
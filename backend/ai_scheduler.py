@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+# Menor número = maior prioridade
+PRIORITIES = {'interactive': 0, 'refill': 1, 'batch': 2}
+
+
+class Shed(RuntimeError):
+    """Chamada de IA descartada pelo agendador (orçamento ou fila esgotados)."""
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, n, reserve=0.0):
+        self._refill()
+        return self.tokens - n >= self.capacity * reserve
+
+    def take(self, n):
+        self.tokens -= n
+
+    def wait_time(self, n, reserve=0.0):
+        self._refill()
+        missing = n + self.capacity * reserve - self.tokens
+        return max(0.0, missing / self.rate) if self.rate else float('inf')
+
+
+class AiScheduler:
+    """Agendador único para todas as chamadas de IA.
+
+    Classes de prioridade (interactive > refill > batch), orçamento de requisições e tokens
+    por minuto (token bucket) e concorrência limitada. Refill/batch não consomem a reserva
+    deixada para o interativo e são descartados (shed) se esperarem mais que o limite da classe.
+    Cada tentativa num modelo (fallbacks e hedges do ModelRouter) é admitida e cobrada à parte.
+    """
+
+    def __init__(self, rpm=60, tpm=120000, max_concurrency=4, reserve=0.2, max_wait=None):
+        self.max_concurrency = max_concurrency
+        self.reserve = reserve
+        self.max_wait = max_wait or {'interactive': 30.0, 'refill': 15.0, 'batch': 120.0}
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._waits = {p: deque(maxlen=200) for p in PRIORITIES}
+        self.counters = {p: {'admitted': 0, 'shed': 0} for p in PRIORITIES}
+
+    def init_app(self, app):
+        c = app.config
+        self.max_concurrency = c.get('AI_MAX_CONCURRENCY', self.max_concurrency)
+        self.reserve = c.get('AI_INTERACTIVE_RESERVE', self.reserve)
+        self._requests = TokenBucket(c.get('AI_REQUESTS_PER_MINUTE', self._requests.capacity))
+        self._tokens = TokenBucket(c.get('AI_TOKENS_PER_MINUTE', self._tokens.capacity))
+        self.max_wait = {
+            'interactive': c.get('AI_MAX_WAIT_INTERACTIVE', self.max_wait['interactive']),
+            'refill': c.get('AI_MAX_WAIT_REFILL', self.max_wait['refill']),
+            'batch': c.get('AI_MAX_WAIT_BATCH', self.max_wait['batch']),
+        }
+
+    @staticmethod
+    def estimate_tokens(prompt, expected_output=400):
+        # Aproximação grosseira: ~4 caracteres por token
+        return len(prompt) // 4 + expected_output
+
+    def _limits(self, priority, tokens):
+        reserve = self.reserve if PRIORITIES[priority] > 0 else 0.0
+        # Uma chamada maior que o orçamento inteiro nunca caberia: limita ao que a classe pode usar
+        return reserve, min(tokens, self._tokens.capacity * (1 - reserve))
+
+    def _admit(self, priority, tokens, start):
+        """Consome uma vaga e o orçamento (chamar com self._cond adquirido)."""
+        self._requests.take(1)
+        self._tokens.take(tokens)
+        self._active += 1
+        self._waits[priority].append(time.monotonic() - start)
+        self.counters[priority]['admitted'] += 1
+
+    def acquire(self, priority, tokens):
+        """Espera a vez (prioridade, orçamento e concorrência). Retorna False se a chamada foi descartada."""
+        reserve, tokens = self._limits(priority, tokens)
+        ticket = (PRIORITIES[priority], next(self._seq))
+        start = time.monotonic()
+        deadline = start + self.max_wait[priority]
+
+        with self._cond:
+            heapq.heappush(self._heap, ticket)
+            while True:
+                if self._heap[0] == ticket and self._active < self.max_concurrency \
+                        and self._requests.available(1, reserve) and self._tokens.available(tokens, reserve):
+                    heapq.heappop(self._heap)
+                    self._admit(priority, tokens, start)
+                    self._cond.notify_all()
+                    return True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._heap.remove(ticket)
+                    heapq.heapify(self._heap)
+                    self.counters[priority]['shed'] += 1
+                    self._cond.notify_all()
+                    return False
+
+                budget_wait = max(self._requests.wait_time(1, reserve), self._tokens.wait_time(tokens, reserve))
+                self._cond.wait(min(remaining, max(budget_wait, 0.01)))
+
+    def try_acquire(self, priority, tokens):
+        """Admite só se houver vaga agora e ninguém de prioridade igual ou maior na fila (ex.: hedge)."""
+        reserve, tokens = self._limits(priority, tokens)
+        with self._cond:
+            if self._heap and self._heap[0][0] <= PRIORITIES[priority]: return False
+            if self._active >= self.max_concurrency or not self._requests.available(1, reserve) \
+                    or not self._tokens.available(tokens, reserve):
+                return False
+            self._admit(priority, tokens, time.monotonic())
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            queued = {p: 0 for p in PRIORITIES}
+            names = {v: k for k, v in PRIORITIES.items()}
+            for rank, _ in self._heap:
+                queued[names[rank]] += 1
+            classes = {}
+            for p in PRIORITIES:
+                w = sorted(self._waits[p])
+                classes[p] = {
+                    **self.counters[p], 'queued': queued[p],
+                    'wait_avg_ms': round(sum(w) / len(w) * 1000, 1) if w else None,
+                    'wait_p95_ms': round(w[min(len(w) - 1, int(len(w) * 0.95))] * 1000, 1) if w else None,
+                    'max_wait_s': self.max_wait[p],
+                }
+            self._requests._refill()
+            self._tokens._refill()
+            return {
+                'active': self._active, 'max_concurrency': self.max_concurrency,
+                'requests_available': round(self._requests.tokens, 1), 'requests_per_minute': self._requests.capacity,
+                'tokens_available': round(self._tokens.tokens), 'tokens_per_minute': self._tokens.capacity,
+                'classes': classes,
+            }
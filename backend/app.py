@@ -1,57 +1,45 @@
-import os
+import hmac
+import math
 import json
 import random
-import time
 import re
-from flask import Flask, request, jsonify
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from flask_migrate import Migrate
 from flask_cors import CORS
+from sqlalchemy.exc import IntegrityError
 from config import Config
-from models import db, User, Question, UserActivity, Achievement
-import pandas as pd
-import numpy as np
-import google.generativeai as genai
-from datetime import datetime, timezone
-from google.api_core import exceptions
-from sqlalchemy import text # Importante para queries SQL diretas com parâmetros
-
-# Tenta importar o PyMongo
-try:
-    from pymongo import MongoClient
-except ImportError:
-    MongoClient = None
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-db.init_app(app)
-migrate = Migrate(app, db)
-
-# Configuração do MongoDB (Opcional)
-mongo_client = None
-logs_collection = None
-
-if MongoClient:
-    try:
-        mongo_client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=2000)
-        mongo_client.server_info() # Força conexão para testar
-        mongo_db = mongo_client['upwise_datalake']
-        logs_collection = mongo_db['activity_logs'] 
-        print("✅ Conectado ao MongoDB com sucesso!")
-    except Exception as e:
-        print(f"⚠️ MongoDB não disponível: {e}. Logs serão apenas locais.")
-        mongo_client = None
-else:
-    print("ℹ️ PyMongo não instalado. Logs do MongoDB desativados.")
-
-CORS(app)
+from models import db, User, Question, UserActivity, UserStat, Achievement, SubmitReceipt
+from question_pool import QuestionPool
+from stats import record_answers, get_progress
+from achievements import achievement_engine
+from question_sampler import sample_unseen_questions, sample_questions, sample_questions_near
+from question_catalog import QuestionCatalog
+from leaderboard import Leaderboard
+from user_cache import UserResponseCache
+from round_prefetch import RoundPrefetcher
+from activity_export import gzip_stream, iter_activity_chunks, last_activity_id
+from activity_log import ActivityLogShipper
+from feedback_cache import FeedbackCache
+from gemini_router import ModelRouter
+from ai_scheduler import AiScheduler, Shed
+from metrics import metrics
+from datetime import date, datetime, timezone
+
+# Importar este módulo não toca em serviços externos: o SDK do Gemini, o PyMongo e a thread
+# de reabastecimento só são carregados no primeiro uso (ver create_app no fim do arquivo)
+api = Blueprint('api', __name__)
+migrate = Migrate()
+
+# Logs do datalake (MongoDB) enviados em background
+activity_log = ActivityLogShipper()
 
 # Configurações IA e Constantes
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if GOOGLE_API_KEY: 
-    genai.configure(api_key=GOOGLE_API_KEY)
-else:
-    print("❌ AVISO: GOOGLE_API_KEY não encontrada no arquivo .env")
+def ai_enabled():
+    # Lido do app atual: respeita a config passada para create_app(config)
+    return bool(current_app.config.get('GOOGLE_API_KEY'))
 
 QUESTIONS_PER_LEVEL_SEED = 3
 TOPICS_TO_GENERATE = ["Tecnologia", "Ciência", "História", "Matemática", "Artes", "Geografia", "Filosofia", "Sociologia"]
@@ -73,243 +61,349 @@ def extract_json_from_response(text):
         print(f"❌ Falha ao decodificar JSON da IA: {e}")
         return None
 
-def call_gemini(prompt):
-    models = ['gemini-2.0-flash', 'gemini-1.5-flash-latest', 'gemini-1.5-flash', 'gemini-2.5-flash']
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-    ]
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+# Toda chamada de IA passa pelo agendador (prioridade + orçamento RPM/TPM)
+ai_scheduler = AiScheduler()
+
+# Clientes em cache, circuit breaker e prazo por modelo; cada tentativa é cobrada no agendador (ver gemini_router.py)
+gemini_router = ModelRouter(Config.GEMINI_MODELS, safety_settings=SAFETY_SETTINGS, scheduler=ai_scheduler)
+
+def call_gemini(prompt, priority='interactive'):
+    start = time.perf_counter()
+    text = gemini_router.generate(prompt, priority)
+    # Inclui a espera na fila do agendador e os fallbacks entre modelos (cada tentativa é medida no roteador)
+    metrics.observe(metrics.ai_call, time.perf_counter() - start, priority=priority, outcome='ok' if text else 'failed')
+    return text
+
+DIFFICULTIES = ['fácil', 'médio', 'difícil']
+LEVELS = ['Iniciante', 'Intermediário', 'Avançado']
+
+# Guia de dificuldade ajustado para ser mais desafiador
+DIFFICULTY_GUIDES = {
+    "fácil": "Nível fundamental/básico, mas NÃO trivial. Evite perguntas óbvias como 'quanto é 2+2'. Foque em definições, conceitos iniciais ou fatos históricos importantes.",
+    "médio": "Nível ensino médio/vestibular. Exige raciocínio, interpretação de texto ou aplicação de fórmulas simples. Não pode ser respondida apenas com senso comum.",
+    "difícil": "Nível universitário ou especialista. Exige análise crítica, correlação de conceitos complexos, detalhes específicos ou cálculos de múltiplas etapas."
+}
+
+def build_question_from_ai_data(data, difficulty, topic):
+    """Valida e normaliza um item JSON da IA. Retorna Question (não salva) ou None se malformado."""
+    if not isinstance(data, dict): return None
+    statement, options, correct = data.get('statement'), data.get('options'), data.get('correct_answer')
+    if not isinstance(statement, str) or not statement.strip(): return None
+    if not isinstance(options, list) or len(options) < 2 or correct is None: return None
+
+    opts = [clean_option_text(str(o)) for o in options]
+    corr = clean_option_text(str(correct))
+    if not corr or not all(opts): return None
+
+    if corr not in opts:
+        opts[0] = corr
+        random.shuffle(opts)
+
+    return Question(
+        statement=statement.strip(), options=opts, correct_answer=corr,
+        difficulty=difficulty, topic=data.get('topic') or topic
+    )
+
+def save_questions(questions):
+    """Insere as questões em uma única transação."""
+    if not questions: return []
+    try:
+        db.session.add_all(questions)
+        db.session.commit()
+        return questions
+    except Exception as e:
+        print(f"❌ Erro ao salvar lote de questões: {e}")
+        db.session.rollback()
+        return []
 
-    for m in models:
-        try:
-            model = genai.GenerativeModel(m)
-            response = model.generate_content(prompt, safety_settings=safety_settings)
-            if response.text: return response.text
-        except exceptions.PermissionDenied: print(f"   ⛔ Permissão negada no modelo {m}.")
-        except exceptions.NotFound: print(f"   ⚠️ Modelo {m} não encontrado.")
-        except Exception as e: print(f"   ⚠️ Erro no modelo {m}: {e}")
-    return None
-
-def generate_new_question_with_ai(difficulty, topic=None):
-    if not GOOGLE_API_KEY: 
+def generate_new_question_with_ai(difficulty, topic=None, priority='refill'):
+    if not ai_enabled():
         print("⚠️ Tentativa de gerar questão sem API KEY configurada.")
         return None
         
     if not topic: topic = random.choice(TOPICS_TO_GENERATE)
     
-    # Guia de dificuldade ajustado para ser mais desafiador
-    guides = {
-        "fácil": "Nível fundamental/básico, mas NÃO trivial. Evite perguntas óbvias como 'quanto é 2+2'. Foque em definições, conceitos iniciais ou fatos históricos importantes.",
-        "médio": "Nível ensino médio/vestibular. Exige raciocínio, interpretação de texto ou aplicação de fórmulas simples. Não pode ser respondida apenas com senso comum.",
-        "difícil": "Nível universitário ou especialista. Exige análise crítica, correlação de conceitos complexos, detalhes específicos ou cálculos de múltiplas etapas."
-    }
-    
     prompt = f"""
     Atue como um professor especialista elaborando uma prova.
     Gere 1 questão de múltipla escolha desafiadora sobre: {topic}. 
     Nível de Dificuldade: {difficulty.upper()}.
-    Diretriz de Dificuldade: {guides.get(difficulty, "")}
+    Diretriz de Dificuldade: {DIFFICULTY_GUIDES.get(difficulty, "")}
     
     JSON APENAS: {{"statement": "Enunciado da questão...", "options": ["Opção A", "Opção B", "Opção C", "Opção D"], "correct_answer": "Texto exato da correta", "topic": "{topic}"}}
     A 'correct_answer' deve ser IDÊNTICA a uma das 'options'. Não use markdown.
     """
     
     print(f"🤖 Solicitando questão ({difficulty}) para IA sobre {topic}...")
-    resp = call_gemini(prompt)
+    resp = call_gemini(prompt, priority)
     if not resp: 
         print("❌ A IA não retornou resposta.")
         return None
     
-    data = extract_json_from_response(resp)
-    if not data: return None
-    
-    try:
-        opts = [clean_option_text(str(o)) for o in data['options']]
-        corr = clean_option_text(str(data['correct_answer']))
-        
-        if corr not in opts: 
-            opts[0] = corr
-            random.shuffle(opts)
-        
-        nq = Question(
-            statement=data['statement'], options=opts, correct_answer=corr, 
-            difficulty=difficulty, topic=data.get('topic', topic)
-        )
-        db.session.add(nq)
-        db.session.commit()
-        print(f"✅ IA Gerou e salvou: {difficulty} - {topic}")
-        return nq
-    except Exception as e:
-        print(f"❌ Erro ao salvar questão: {e}")
-        db.session.rollback()
-        return None
+    nq = build_question_from_ai_data(extract_json_from_response(resp), difficulty, topic)
+    if not nq or not save_questions([nq]): return None
+    print(f"✅ IA Gerou e salvou: {difficulty} - {topic}")
+    return nq
+
+def request_question_batch_from_ai(specs, priority='batch'):
+    """Pede N questões (mistura de dificuldades/tópicos) em uma única chamada à IA.
+
+    specs: lista de (dificuldade, tópico). Retorna as questões válidas, ainda não salvas.
+    Cada item devolvido ecoa o número do pedido ("index"); itens sem número válido ou com
+    número repetido são descartados, em vez de casar dificuldade/tópico pela posição.
+    Não toca no banco nem no app (quem chama confere ai_enabled()), então pode rodar em threads de trabalho.
+    """
+    if not specs: return []
 
-def generate_ai_feedback(q, ans, corr, is_cor):
-    if not GOOGLE_API_KEY: return None
-    return call_gemini(f"Atue como tutor. O aluno {'acertou' if is_cor else 'errou'} a questão: '{q}'. Resp dele: '{ans}'. Correta: '{corr}'. Dê um feedback curto e didático (1 frase) explicando o porquê.")
-
-def check_achievements(user, current_round_acc=None):
-    new = []
-    badges = [
-        {"title": "Primeiros Passos", "cond": lambda u: u.total_activities >= 1, "desc": "1ª atividade concluída.", "icon": "flag"},
-        {"title": "Estudante Dedicado", "cond": lambda u: u.score >= 100, "desc": "100 pontos XP.", "icon": "star"},
-        {"title": "Mestre", "cond": lambda u: u.level == 'Avançado', "desc": "Nível Avançado alcançado.", "icon": "trophy"},
-        {"title": "Imparável", "cond": lambda u: u.total_activities >= 20, "desc": "20 questões respondidas.", "icon": "target"},
-        {"title": "Maratonista", "cond": lambda u: u.total_activities >= 50, "desc": "50 questões respondidas.", "icon": "zap"},
-        {"title": "Lendário", "cond": lambda u: u.score >= 1000, "desc": "Acumulou 1000 pontos XP.", "icon": "crown"},
-        {"title": "Na Mosca!", "cond": lambda u: current_round_acc is not None and current_round_acc >= 99.9, "desc": "Acertou 100% em uma rodada.", "icon": "crosshair"},
-        {"title": "Membro VIP", "cond": lambda u: u.is_premium, "desc": "Tornou-se um assinante Premium.", "icon": "gem"},
-    ]
-    
-    user_badges_titles = [b.title for b in user.achievements]
-    for b in badges:
-        if b["cond"](user) and b["title"] not in user_badges_titles:
-            db.session.add(Achievement(user_id=user.id, title=b["title"], description=b["desc"], icon_name=b["icon"]))
-            new.append(b["title"])
-    db.session.commit()
-    return new
+    items = "\n".join(
+        f"    {i + 1}. Tópico: {t} | Dificuldade: {d.upper()} ({DIFFICULTY_GUIDES.get(d, '')})"
+        for i, (d, t) in enumerate(specs)
+    )
+    prompt = f"""
+    Atue como um professor especialista elaborando uma prova.
+    Gere {len(specs)} questões de múltipla escolha desafiadoras, uma para cada item abaixo:
+{items}
+
+    JSON APENAS: {{"questions": [{{"index": 1, "statement": "Enunciado da questão...", "options": ["Opção A", "Opção B", "Opção C", "Opção D"], "correct_answer": "Texto exato da correta", "topic": "Tópico do item"}}]}}
+    'index' é o número do item atendido. A 'correct_answer' deve ser IDÊNTICA a uma das 'options'. Não use markdown.
+    """
+
+    print(f"🤖 Solicitando lote de {len(specs)} questões para IA...")
+    resp = call_gemini(prompt, priority)
+    if not resp:
+        print("❌ A IA não retornou resposta.")
+        return []
+
+    data = extract_json_from_response(resp)
+    raw = data.get('questions') if isinstance(data, dict) else None
+    if not isinstance(raw, list): return []
+
+    questions, answered, mismatched = [], set(), 0
+    for item in raw:
+        index = item.get('index') if isinstance(item, dict) else None
+        if isinstance(index, str) and index.strip().isdigit(): index = int(index)
+        if type(index) is not int or not 1 <= index <= len(specs) or index in answered:
+            mismatched += 1
+            continue
+        answered.add(index)
+        d, t = specs[index - 1]
+        nq = build_question_from_ai_data(item, d, t)
+        if nq: questions.append(nq)
+    if mismatched:
+        print(f"⚠️ {mismatched} de {len(raw)} questões do lote descartadas (index ausente, inválido ou repetido).")
+    if len(questions) < len(raw) - mismatched:
+        print(f"⚠️ {len(raw) - mismatched - len(questions)} de {len(raw)} questões do lote descartadas (malformadas).")
+    return questions
+
+def generate_questions_batch_with_ai(specs, priority='batch'):
+    if not ai_enabled(): return []
+    saved = save_questions(request_question_batch_from_ai(specs, priority))
+    if saved: print(f"✅ IA Gerou e salvou lote de {len(saved)} questões.")
+    if saved and current_app.config['FEEDBACK_WARM_ON_GENERATE']:
+        for q in saved: feedback_cache.warm(q, priority)
+    return saved
+
+def generate_questions_for_pool(difficulty, topic, count):
+    return len(generate_questions_batch_with_ai([(difficulty, topic)] * count, 'refill'))
+
+question_catalog = QuestionCatalog(clean_option_text)
+
+question_pool = QuestionPool(generate_questions_for_pool, DIFFICULTIES, TOPICS_TO_GENERATE)
+
+# Ranking global e por nível (Fenwick em memória, atualizado no submit)
+leaderboard = Leaderboard(LEVELS)
+
+# ETag/304 e corpos serializados por (tela, usuário, data_version)
+user_cache = UserResponseCache()
+
+def feedback_prompt(q, ans, corr, is_cor):
+    return f"Atue como tutor. O aluno {'acertou' if is_cor else 'errou'} a questão: '{q}'. Resp dele: '{ans}'. Correta: '{corr}'. Dê um feedback curto e didático (1 frase) explicando o porquê."
+
+def generate_ai_feedback(q, ans, corr, is_cor, priority='interactive'):
+    if not ai_enabled(): return None
+    return call_gemini(feedback_prompt(q, ans, corr, is_cor), priority)
+
+# Ao mudar o prompt acima, incremente FEEDBACK_PROMPT_VERSION para invalidar o cache
+feedback_cache = FeedbackCache(generate_ai_feedback, clean_option_text)
+
+def feedback_streams():
+    # Ids de stream assinados: carregam (questão, resposta, acerto), sem estado no servidor
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='feedback-stream')
 
 # --- ROTAS ---
 
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     d = request.get_json()
     if User.query.filter_by(email=d['email']).first(): return jsonify({'error': 'Email existe'}), 400
-    u = User(name=d['name'], email=d['email'], password=d['password'])
+    # Usuário novo não tem conquistas: bitset já sincronizado
+    u = User(name=d['name'], email=d['email'], password=d['password'], badges_mask=0)
     db.session.add(u)
+    db.session.flush()
+    achievement_engine.evaluate(u, {'register'})
+    uid, score, level = u.id, u.score, u.level
     db.session.commit()
-    check_achievements(u)
+    leaderboard.update(uid, score, level)
     return jsonify({'message': 'Criado', 'user': u.to_dict()}), 201
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     d = request.get_json()
     u = User.query.filter_by(email=d['email']).first()
     if u and u.password == d['password']: return jsonify({'message': 'Logado', 'user': u.to_dict()}), 200
     return jsonify({'error': 'Inválido'}), 401
 
-@app.route('/api/user/<int:id>', methods=['GET', 'PUT'])
+@api.route('/api/user/<int:id>', methods=['GET', 'PUT'])
 def user_r(id):
+    if request.method == 'GET':
+        resp = user_cache.respond('user', id, lambda: db.session.get(User, id).to_dict())
+        return resp if resp is not None else (jsonify({'error': '404'}), 404)
     u = db.session.get(User, id)
     if not u: return jsonify({'error': '404'}), 404
-    if request.method == 'PUT':
-        d = request.get_json()
-        if 'name' in d: u.name = d['name']
-        if 'email' in d: u.email = d['email']
-        db.session.commit()
+    d = request.get_json()
+    if 'name' in d: u.name = d['name']
+    if 'email' in d: u.email = d['email']
+    u.bump_data_version()
+    db.session.commit()
     return jsonify(u.to_dict())
 
-@app.route('/api/user/subscribe', methods=['POST'])
+@api.route('/api/user/subscribe', methods=['POST'])
 def subscribe():
     d = request.get_json()
     user_id = d.get('user_id')
     u = db.session.get(User, user_id)
     if not u: return jsonify({'error': 'User not found'}), 404
     u.is_premium = True
+    u.bump_data_version()
+    badges = achievement_engine.evaluate(u, {'is_premium'})
     db.session.commit()
-    return jsonify({'message': 'Assinatura ativada!', 'user': u.to_dict(), 'new_achievements': check_achievements(u)})
-
-@app.route('/api/user/achievements/<int:id>', methods=['GET'])
-def ach(id):
-    return jsonify([a.to_dict() for a in Achievement.query.filter_by(user_id=id).all()])
+    return jsonify({'message': 'Assinatura ativada!', 'user': u.to_dict(), 'new_achievements': badges})
 
-@app.route('/api/user/progress/<int:id>', methods=['GET'])
-def prog(id):
-    try:
-        # SQL para buscar dados de histórico e tópicos (JOIN entre atividades e questões)
-        # Atenção aos nomes das tabelas no seu banco (geralmente user_activities e questions)
-        query = text("""
-            SELECT ua.timestamp, ua.is_correct, q.topic 
-            FROM user_activities ua
-            JOIN questions q ON ua.question_id = q.id
-            WHERE ua.user_id = :user_id
-            ORDER BY ua.timestamp ASC
-        """)
-        
-        # Executa a query usando a conexão do SQLAlchemy
-        with db.engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={"user_id": id})
-
-        if df.empty:
-            return jsonify({
-                'history': {'labels': [], 'data': []},
-                'topics': {'labels': [], 'data': []}
-            })
-
-        # Processamento para o Gráfico de Evolução (Linha)
-        df['date'] = pd.to_datetime(df['timestamp']).dt.strftime('%d/%m')
-        history_series = df.groupby('date')['is_correct'].mean() * 100
-        history_data = {
-            'labels': history_series.index.tolist(),
-            'data': history_series.round(1).tolist()
-        }
+def user_achievements(id):
+    return [a.to_dict() for a in Achievement.query.filter_by(user_id=id).all()]
 
-        # Processamento para o Gráfico de Tópicos (Barra)
-        # Agrupa por tópico e calcula a média de acertos
-        topic_series = df.groupby('topic')['is_correct'].mean() * 100
-        # Ordena para mostrar os melhores primeiro
-        topic_series = topic_series.sort_values(ascending=False)
-        topics_data = {
-            'labels': topic_series.index.tolist(),
-            'data': topic_series.round(1).tolist()
-        }
+@api.route('/api/user/achievements/<int:id>', methods=['GET'])
+def ach(id):
+    resp = user_cache.respond('achievements', id, lambda: user_achievements(id))
+    return resp if resp is not None else jsonify(user_achievements(id))
 
-        return jsonify({
-            'history': history_data,
-            'topics': topics_data
-        })
+@api.route('/api/user/stats/<int:id>', methods=['GET'])
+def user_stats(id):
+    return jsonify([s.to_dict() for s in UserStat.query.filter_by(user_id=id).all()])
 
+def user_progress(id, start, end):
+    try:
+        with metrics.stage('progress_rollup'):
+            return get_progress(id, start, end)
     except Exception as e:
         print(f"Erro ao gerar progresso: {e}")
-        return jsonify({
+        return {
             'history': {'labels': [], 'data': []},
             'topics': {'labels': [], 'data': []}
-        })
+        }
 
-@app.route('/api/activities/next/<int:id>', methods=['GET'])
-def next_q(id):
-    u = db.session.get(User, id)
+@api.route('/api/user/progress/<int:id>', methods=['GET'])
+def prog(id):
+    # Janela opcional: ?start=AAAA-MM-DD&end=AAAA-MM-DD
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Datas devem estar no formato AAAA-MM-DD'}), 400
+
+    resp = user_cache.respond('progress', id, lambda: user_progress(id, start, end))
+    return resp if resp is not None else jsonify(user_progress(id, start, end))
+
+def assemble_round(u, topic=None):
+    """Ids da próxima rodada: perto da habilidade calibrada, depois pelo rótulo, depois revisão."""
     diff = 'fácil' if u.level == 'Iniciante' else 'difícil' if u.level == 'Avançado' else 'médio'
+    ids = []
+    cfg = current_app.config
+    if cfg['CALIBRATED_SELECTION'] and u.ability is not None:
+        # P(acerto) = sigmoid(habilidade - dificuldade): mira a dificuldade que dá a taxa alvo
+        acc = cfg['CALIBRATION_TARGET_ACCURACY']
+        target = u.ability - math.log(acc / (1 - acc))
+        ids = sample_questions_near(u.id, target, 5 - cfg['CALIBRATION_EXPLORE_SLOTS'], topic=topic)
+    ids += sample_unseen_questions(u.id, diff, 5 - len(ids), topic=topic, exclude=ids)
     
-    ids = db.session.query(UserActivity.question_id).filter_by(user_id=id)
-    qs = Question.query.filter(Question.difficulty == diff, ~Question.id.in_(ids)).order_by(db.func.random()).limit(5).all()
-    
-    if len(qs) < 5:
-        if GOOGLE_API_KEY:
-            print(f"⚠️ Banco com poucas questões ({len(qs)}). Tentando gerar com IA...")
-            for _ in range(5 - len(qs)):
-                nq = generate_new_question_with_ai(diff)
-                if nq: qs.append(nq)
+    if len(ids) < 5:
+        # Nunca gera com IA dentro da requisição: avisa o reabastecedor e completa com revisão
+        if ai_enabled():
+            question_pool.notify_shortage(diff, 5 - len(ids))
         else:
             print("⚠️ Poucas questões e sem chave de API.")
+        ids += sample_questions(diff, 5 - len(ids), topic=topic, exclude=ids)
+    return ids
+
+def prefetch_round(user_id):
+    u = db.session.get(User, user_id)
+    if not u: return None
+    return u.level, question_catalog.payloads_json(assemble_round(u))
+
+# Próxima rodada montada em background depois do submit (ver round_prefetch.py)
+round_prefetch = RoundPrefetcher(prefetch_round)
+
+@api.route('/api/activities/next/<int:id>', methods=['GET'])
+def next_q(id):
+    u = db.session.get(User, id)
+    topic = request.args.get('topic') or None
+    if ai_enabled():
+        question_pool.ensure_started()
+        gemini_router.preload()
+
+    # Rodada pré-montada no último submit (só sem filtro de tópico; inválida se o nível mudou)
+    if not topic:
+        body = round_prefetch.take(id, u.level)
+        if body is not None: return Response(body, mimetype='application/json')
 
-    return jsonify([q.to_dict() for q in qs])
+    # Payloads já serializados no catálogo em memória
+    return Response(question_catalog.payloads_json(assemble_round(u, topic)), mimetype='application/json')
 
-@app.route('/api/activities/submit', methods=['POST'])
+@api.route('/api/activities/submit', methods=['POST'])
 def submit():
     d = request.get_json()
     uid = d['user_id']
     answers = d['answers']
+    # Chave de idempotência: reenvios da mesma rodada não gravam nem pontuam de novo
+    round_key = request.headers.get('Idempotency-Key') or d.get('round_id')
+    if round_key:
+        round_key = str(round_key)
+        # SubmitReceipt.idempotency_key é String(64): chave maior estouraria no INSERT (500 no Postgres)
+        if len(round_key) > 64: return jsonify({'error': 'Idempotency-Key deve ter no máximo 64 caracteres'}), 400
+        receipt = SubmitReceipt.query.filter_by(user_id=uid, idempotency_key=round_key).first()
+        if receipt: return jsonify({**receipt.response, 'replayed': True})
+
     u = db.session.get(User, uid)
     
     corrects = 0
     score = 0
     correction_details = []
+    graded = []
+    activity_rows = []
     mongo_logs = []
     timestamp_now = datetime.now(timezone.utc)
+    catalog = question_catalog.get_many([item['question_id'] for item in answers])
 
     for item in answers:
-        q = db.session.get(Question, item['question_id'])
+        q = catalog.get(item['question_id'])
         if not q: continue
-        is_cor = (clean_option_text(q.correct_answer) == clean_option_text(item['answer']))
+        is_cor = (q.normalized_answer == clean_option_text(item['answer']))
         if is_cor:
             corrects += 1
             score += 10
-        db.session.add(UserActivity(user_id=uid, question_id=q.id, user_answer=item['answer'], is_correct=is_cor))
+        activity_rows.append({
+            'user_id': uid, 'question_id': q.id, 'user_answer': item['answer'],
+            'is_correct': is_cor, 'timestamp': timestamp_now.replace(tzinfo=None)
+        })
+        graded.append((q, is_cor))
         
-        if mongo_client:
+        if activity_log.enabled:
             mongo_logs.append({
                 "user_id": uid, "user_level_at_time": u.level,
                 "question_id": q.id, "question_topic": q.topic,
@@ -320,57 +414,240 @@ def submit():
         
         correction_details.append({'question_id': q.id, 'correct_answer': q.correct_answer, 'user_answer': item['answer'], 'is_correct': is_cor})
 
-    db.session.commit()
-
-    if mongo_client is not None and logs_collection is not None and mongo_logs:
-        try:
-            logs_collection.insert_many(mongo_logs)
-            print(f"📊 {len(mongo_logs)} logs salvos no MongoDB!")
-        except Exception as e:
-            print(f"⚠️ Erro ao salvar no Mongo: {e}")
+    # Unidade de trabalho única: atividades (executemany), contadores, nível, conquistas e recibo
+    if activity_rows: db.session.execute(db.insert(UserActivity), activity_rows)
+    with metrics.stage('record_answers'):
+        record_answers(u, graded, day=timestamp_now.date(), score=score)
 
-    ai_feed = None
-    if answers and GOOGLE_API_KEY:
-        try:
-            last = answers[-1]
-            q_last = db.session.get(Question, last['question_id'])
-            is_last_cor = (clean_option_text(q_last.correct_answer) == clean_option_text(last['answer']))
-            ai_feed = generate_ai_feedback(q_last.statement, last['answer'], q_last.correct_answer, is_last_cor)
-        except: pass
-
-    q_sql = f"SELECT is_correct FROM user_activities WHERE user_id = {uid}"
-    df = pd.read_sql(q_sql, db.engine)
-    if not df.empty:
-        u.accuracy = round(float(np.mean(df['is_correct'].astype(int).values) * 100), 1)
-        u.total_activities = int(len(df))
-    
-    u.score += score
     acc_round = (corrects / len(answers)) * 100 if answers else 0
+    old_level = u.level
     
     if acc_round >= 80 and u.level != 'Avançado': u.level = 'Intermediário' if u.level == 'Iniciante' else 'Avançado'
     elif acc_round < 40 and u.level != 'Iniciante': u.level = 'Intermediário' if u.level == 'Avançado' else 'Iniciante'
 
-    db.session.commit()
-    badges = check_achievements(u, current_round_acc=acc_round if answers else None)
+    u.bump_data_version()
 
-    return jsonify({
+    # Só as regras que dependem do que mudou nesta rodada
+    changed = {'round'}
+    if graded: changed |= {'total_activities', 'score'}
+    if u.level != old_level: changed.add('level')
+    with metrics.stage('achievements'):
+        badges = achievement_engine.evaluate(u, changed, round_accuracy=acc_round if answers else None)
+
+    result = {
         'new_score': u.score, 'new_level': u.level, 'accuracy': u.accuracy,
-        'round_accuracy': acc_round, 'ai_feedback': ai_feed,
+        'round_accuracy': acc_round, 'ai_feedback': None,
         'new_achievements': badges, 'correction_details': correction_details
+    }
+    if round_key: db.session.add(SubmitReceipt(user_id=uid, idempotency_key=round_key, response=result))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro envio da mesma rodada ganhou a corrida: devolve o resultado dele
+        db.session.rollback()
+        receipt = SubmitReceipt.query.filter_by(user_id=uid, idempotency_key=round_key).first()
+        if not receipt: raise
+        return jsonify({**receipt.response, 'replayed': True})
+
+    leaderboard.update(uid, result['new_score'], result['new_level'])
+    round_prefetch.schedule(uid, result['new_level'])
+    activity_log.ship(mongo_logs)
+
+    # Não espera a IA: devolve o feedback se já estiver em cache, senão um id para o stream SSE
+    if answers and ai_enabled():
+        try:
+            last = answers[-1]
+            q_last = catalog[last['question_id']]
+            is_last_cor = (q_last.normalized_answer == clean_option_text(last['answer']))
+            result['ai_feedback'] = feedback_cache.lookup(q_last, last['answer'], is_last_cor)
+            if result['ai_feedback'] is None:
+                result['feedback_stream_id'] = feedback_streams().dumps({'q': q_last.id, 'a': last['answer'], 'c': is_last_cor})
+        except Exception as e: print(f"⚠️ Erro ao preparar feedback: {e}")
+
+    return jsonify(result)
+
+def sse(data, event=None):
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api.route('/api/activities/feedback/<stream_id>', methods=['GET'])
+def feedback_stream(stream_id):
+    try:
+        job = feedback_streams().loads(stream_id, max_age=current_app.config['FEEDBACK_STREAM_MAX_AGE'])
+    except BadSignature:
+        return jsonify({'error': 'Stream inválido ou expirado'}), 404
+    q = question_catalog.get(job['q'])
+    if not q: return jsonify({'error': '404'}), 404
+
+    def events():
+        # O submit que criou o stream já contou esta consulta
+        cached = feedback_cache.lookup(q, job['a'], job['c'], count=False)
+        if cached is not None:
+            yield sse({'text': cached}, 'done')
+            return
+        prompt = feedback_prompt(q.statement, clean_option_text(job['a']), q.correct_answer, job['c'])
+        # Devolve a conexão ao pool enquanto espera o modelo (o stream pode levar segundos)
+        db.session.close()
+        parts = []
+        try:
+            for chunk in gemini_router.generate_stream(prompt):
+                parts.append(chunk)
+                yield sse({'delta': chunk})
+        except Shed:
+            # Só acontece antes do primeiro pedaço (ver generate_stream)
+            yield sse({'error': 'IA indisponível no momento'}, 'error')
+            return
+        except Exception as e:
+            print(f"⚠️ Erro no stream de feedback: {e}")
+        text = ''.join(parts)
+        if text: feedback_cache.store(q, job['a'], job['c'], text)
+        yield sse({'text': text or None}, 'done')
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def leaderboard_rows(entries):
+    ids = [uid for _, uid, _ in entries]
+    names = dict(db.session.query(User.id, User.name).filter(User.id.in_(ids))) if ids else {}
+    return [{'rank': r, 'user_id': uid, 'name': names.get(uid), 'score': s} for r, uid, s in entries]
+
+@api.route('/api/leaderboard', methods=['GET'])
+def leaderboard_top():
+    # ?level=Iniciante|Intermediário|Avançado (sem level = ranking global) &limit=N
+    level = request.args.get('level') or None
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    try:
+        entries = leaderboard.top(limit, level)
+    except KeyError:
+        return jsonify({'error': 'Nível inválido'}), 400
+    return jsonify({'level': level or 'global', 'entries': leaderboard_rows(entries)})
+
+@api.route('/api/leaderboard/me/<int:id>', methods=['GET'])
+def leaderboard_me(id):
+    # Posição do usuário e vizinhos (?around=N acima e abaixo)
+    level = request.args.get('level') or None
+    around = max(0, min(request.args.get('around', 5, type=int), 25))
+    try:
+        found = leaderboard.around(id, around, level)
+    except KeyError:
+        return jsonify({'error': 'Nível inválido'}), 400
+    if not found: return jsonify({'error': 'Usuário fora deste ranking'}), 404
+    rank, total, entries = found
+    return jsonify({'level': level or 'global', 'rank': rank, 'total': total, 'neighbors': leaderboard_rows(entries)})
+
+@api.route('/api/leaderboard/stats', methods=['GET'])
+def leaderboard_stats():
+    return jsonify(leaderboard.stats())
+
+@api.route('/api/round-prefetch/stats', methods=['GET'])
+def round_prefetch_stats():
+    return jsonify(round_prefetch.stats())
+
+@api.route('/api/user-cache/stats', methods=['GET'])
+def user_cache_stats():
+    return jsonify(user_cache.stats())
+
+@api.route('/api/pool/stats', methods=['GET'])
+def pool_stats():
+    return jsonify(question_pool.stats())
+
+@api.route('/api/catalog/stats', methods=['GET'])
+def catalog_stats():
+    return jsonify(question_catalog.stats())
+
+@api.route('/api/activity-log/stats', methods=['GET'])
+def activity_log_stats():
+    return jsonify(activity_log.stats())
+
+@api.route('/api/feedback-cache/stats', methods=['GET'])
+def feedback_cache_stats():
+    return jsonify(feedback_cache.stats())
+
+@api.route('/api/ai/router', methods=['GET'])
+def ai_router_state():
+    return jsonify(gemini_router.state())
+
+@api.route('/api/ai/scheduler', methods=['GET'])
+def ai_scheduler_stats():
+    return jsonify(ai_scheduler.stats())
+
+@api.route('/metrics', methods=['GET'])
+def metrics_export():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/export/activities', methods=['GET'])
+def export_activities():
+    # Export em massa do histórico: desligado sem EXPORT_TOKEN configurado
+    token = current_app.config['EXPORT_TOKEN']
+    if not token: return jsonify({'error': '404'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Não autorizado'}), 401
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in ('csv', 'jsonl'): return jsonify({'error': 'format deve ser csv ou jsonl'}), 400
+    try:
+        after_id = int(request.args.get('after_id', 0))
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'error': 'after_id/since inválidos'}), 400
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    # Limite fixado agora: o cliente retoma depois com after_id=X-Export-Until-Id
+    until_id = last_activity_id()
+    chunks = iter_activity_chunks(after_id, until_id, since, chunk_size)
+    return Response(stream_with_context(gzip_stream(chunks, fmt)), mimetype='application/gzip', headers={
+        'Content-Disposition': f'attachment; filename=activities_{after_id + 1}_{until_id}.{fmt}.gz',
+        'X-Export-Until-Id': str(until_id), 'X-Accel-Buffering': 'no',
     })
 
-@app.route('/api/seed', methods=['POST'])
+@api.route('/api/seed', methods=['POST'])
 def seed():
-    if not GOOGLE_API_KEY: return jsonify({'error': 'No Key'}), 500
+    if not ai_enabled(): return jsonify({'error': 'No Key'}), 500
+    d = request.get_json(silent=True) or {}
+    per_level = int(d.get('per_level', QUESTIONS_PER_LEVEL_SEED))
+    batch_size = max(1, min(int(d.get('batch_size', current_app.config['QUESTION_BATCH_SIZE'])), current_app.config['QUESTION_BATCH_SIZE']))
+    concurrency = max(1, min(int(d.get('concurrency', 1)), current_app.config['SEED_MAX_CONCURRENCY']))
+
+    specs = []
+    for lvl in DIFFICULTIES:
+        needed = per_level - Question.query.filter_by(difficulty=lvl).count()
+        specs += [(lvl, random.choice(TOPICS_TO_GENERATE)) for _ in range(max(needed, 0))]
+    random.shuffle(specs)
+    batches = [specs[i:i + batch_size] for i in range(0, len(specs), batch_size)]
+
     c = 0
-    for lvl in ['fácil', 'médio', 'difícil']:
-        needed = QUESTIONS_PER_LEVEL_SEED - Question.query.filter_by(difficulty=lvl).count()
-        if needed > 0:
-            for _ in range(needed):
-                topic = random.choice(TOPICS_TO_GENERATE)
-                if generate_new_question_with_ai(lvl, topic): c += 1
-                time.sleep(1)
-    return jsonify({'msg': f'{c} novas'})
+    if concurrency == 1:
+        for b in batches: c += len(generate_questions_batch_with_ai(b))
+    else:
+        # As chamadas à IA rodam em paralelo (limitado); a escrita no banco fica na thread da requisição
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(request_question_batch_from_ai, b) for b in batches]
+            for f in as_completed(futures):
+                try: c += len(save_questions(f.result()))
+                except Exception as e: print(f"⚠️ Erro em lote do seed: {e}")
+    return jsonify({'msg': f'{c} novas', 'batches': len(batches), 'concurrency': concurrency})
+
+# --- APLICAÇÃO ---
+
+def create_app(config=Config):
+    """Cria a aplicação (usado por `flask`, serve.py e pelos scripts).
+
+    Só registra configuração, banco e rotas: nada aqui importa o SDK do Gemini ou o PyMongo,
+    abre conexões ou inicia threads, então migrações e scripts de linha de comando sobem rápido.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    metrics.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    CORS(app)
+
+    for service in (activity_log, gemini_router, ai_scheduler, question_catalog, question_pool, feedback_cache, leaderboard, user_cache, round_prefetch):
+        service.init_app(app)
+
+    app.register_blueprint(api)
+
+    if not app.config.get('GOOGLE_API_KEY'):
+        print("❌ AVISO: GOOGLE_API_KEY não encontrada no arquivo .env")
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,22 @@
+import argparse
+
+from app import create_app
+from models import db
+from achievements import achievement_engine
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Avalia regras de conquistas para todos os usuários (ex.: após criar uma regra nova).")
+    parser.add_argument('--rule', action='append', dest='rules', help="Título da regra (repetível). Padrão: todas.")
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            granted = achievement_engine.backfill(rules=args.rules, batch_size=args.batch_size)
+            print(f"🏅 {granted} conquistas concedidas no backfill.")
+        except KeyError as e:
+            print(f"❌ Regra desconhecida: {e}")
+        except Exception as e:
+            print(f"❌ Erro no backfill de conquistas: {e}")
+            db.session.rollback()
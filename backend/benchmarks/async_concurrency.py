@@ -0,0 +1,95 @@
+"""Concorrência x latência p99 do modo async (gevent) contra um Gemini simulado.
+
+Cada cliente faz uma rodada completa: GET next -> POST submit -> stream SSE do feedback
+(que chama o modelo simulado, com latência fixa). Usa um SQLite temporário.
+
+    python benchmarks/async_concurrency.py --levels 1,10,50,100,200 --model-latency 1.0
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import json
+import time
+import urllib.request
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from common import percentile, setup_app
+
+
+def setup(n_users, n_questions, model_latency):
+    app = setup_app(model_latency=model_latency)
+    from models import db, User, Question
+
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {'name': f'u{i}', 'email': f'u{i}@bench', 'password': 'x', 'level': 'Iniciante'} for i in range(n_users)
+        ])
+        db.session.execute(db.insert(Question), [
+            {'statement': f'Questão {i}', 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 'a',
+             'difficulty': 'fácil', 'topic': 'Artes'} for i in range(n_questions)
+        ])
+        db.session.commit()
+    return app
+
+
+def request(base, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=120) as r:
+        return r.read()
+
+
+def quiz_round(base, user_id):
+    start = time.perf_counter()
+    questions = json.loads(request(base, f'/api/activities/next/{user_id}'))
+    answers = [{'question_id': q['id'], 'answer': q['options'][i % 2]} for i, q in enumerate(questions)]
+    result = json.loads(request(base, '/api/activities/submit', {'user_id': user_id, 'answers': answers}))
+    if result.get('feedback_stream_id'):
+        request(base, f"/api/activities/feedback/{result['feedback_stream_id']}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', default='1,10,50,100,200', help="Níveis de concorrência (rodadas simultâneas).")
+    parser.add_argument('--model-latency', type=float, default=1.0, help="Latência simulada do Gemini (s).")
+    parser.add_argument('--questions', type=int, default=5000)
+    parser.add_argument('--output', help="Grava os resultados em JSON.")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.levels.split(',')]
+    app = setup(max(levels), args.questions, args.model_latency)
+
+    server = WSGIServer(('127.0.0.1', 0), app, spawn=Pool(5000), log=None)
+    server.start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    results = []
+    print(f"{'concorrência':>12} {'rodadas/s':>10} {'p50 (s)':>8} {'p99 (s)':>8} {'erros':>6}")
+    for level in levels:
+        jobs = [gevent.spawn(quiz_round, base, uid) for uid in range(1, level + 1)]
+        start = time.perf_counter()
+        gevent.joinall(jobs)
+        wall = time.perf_counter() - start
+        ok = [j.value for j in jobs if j.successful()]
+        row = {
+            'concurrency': level, 'model_latency_s': args.model_latency, 'errors': level - len(ok),
+            'rounds_per_s': round(len(ok) / wall, 2),
+            'p50_s': round(percentile(ok, 50), 3) if ok else None,
+            'p99_s': round(percentile(ok, 99), 3) if ok else None,
+        }
+        results.append(row)
+        print(f"{level:>12} {row['rounds_per_s']:>10} {row['p50_s']:>8} {row['p99_s']:>8} {row['errors']:>6}")
+
+    server.stop()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
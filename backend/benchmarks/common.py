@@ -0,0 +1,71 @@
+"""Peças compartilhadas pelos benchmarks: Gemini simulado, criação do app e percentis."""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SlowFakeModel:
+    """Substituto do genai.GenerativeModel: dorme `latency` segundos e devolve texto fixo.
+
+    Com gevent (monkey patch) o sleep é cooperativo, como seria a espera de rede real.
+    """
+    latency = 1.0
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        class Chunk:
+            def __init__(self, text): self.text = text
+        if stream:
+            def chunks():
+                for word in ("Feedback ", "simulado ", "do tutor."):
+                    time.sleep(self.latency / 3)
+                    yield Chunk(word)
+            return chunks()
+        time.sleep(self.latency)
+        return Chunk("Feedback simulado do tutor.")
+
+
+def setup_app(database_url=None, model_latency=1.0, env=None):
+    """Cria o app real apontando para `database_url` (padrão: SQLite temporário) com o Gemini simulado.
+
+    Precisa rodar antes de qualquer import do app: a Config lê o ambiente no import.
+    """
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.update({
+        'DATABASE_URL': database_url, 'GOOGLE_API_KEY': 'bench', 'ACTIVITY_LOG_ENABLED': '0',
+        'AI_MAX_CONCURRENCY': '10000', 'AI_REQUESTS_PER_MINUTE': '1000000', 'AI_TOKENS_PER_MINUTE': '1000000000',
+        **(env or {}),
+    })
+    import app as backend
+    from models import db
+
+    SlowFakeModel.latency = model_latency
+    app = backend.create_app()
+    backend.gemini_router.client_factory = SlowFakeModel
+    backend.question_pool.ensure_started = lambda: None  # sem reabastecimento em background
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(latencies, wall):
+    """Vazão e percentis (ms) de uma lista de latências em segundos."""
+    if not latencies: return {'count': 0}
+    return {
+        'count': len(latencies),
+        'throughput_per_s': round(len(latencies) / wall, 2) if wall else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        **{f'p{p}_ms': round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 95, 99)},
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
@@ -0,0 +1,146 @@
+"""Gerador de dados sintéticos para os benchmarks: N usuários, M questões e K atividades.
+
+A distribuição imita a produção: poucos usuários muito ativos (Zipf), algumas questões
+bem mais respondidas que outras, mais atividade nos dias recentes e acerto que depende
+do nível do usuário e da dificuldade da questão. Os contadores (users, user_stats,
+user_progress_daily) são gravados consistentes com o histórico gerado.
+
+    python benchmarks/datagen.py --database-url postgresql://localhost/upwise_bench --reset \\
+        --users 5000 --questions 3000 --activities 500000
+"""
+import argparse
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from common import setup_app
+
+LEVELS = ['Iniciante', 'Intermediário', 'Avançado']
+LEVEL_WEIGHTS = [0.5, 0.35, 0.15]
+
+# Probabilidade de acerto por (nível do usuário, dificuldade da questão)
+P_CORRECT = [[0.75, 0.5, 0.3], [0.85, 0.65, 0.45], [0.92, 0.8, 0.6]]
+
+
+def zipf_weights(n, skew, rng):
+    """Pesos 1/rank^skew atribuídos em ordem aleatória (quem é "popular" não depende do id)."""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return [1.0 / r ** skew for r in ranks]
+
+
+def cumulative(weights):
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def generate(n_users, n_questions, n_activities, seed=42, skew=1.1, days=90, batch_size=5000):
+    """Popula o banco (precisa estar vazio). Retorna um resumo do que foi gerado."""
+    from app import DIFFICULTIES, TOPICS_TO_GENERATE
+    from models import db, User, Question, UserActivity, UserStat, UserProgressDaily
+    from stats import compute_accuracy
+
+    rng = random.Random(seed)
+    if db.session.query(User.id).first() is not None:
+        raise RuntimeError("O banco já tem usuários; use --reset para recriar as tabelas.")
+
+    user_levels = rng.choices(range(3), LEVEL_WEIGHTS, k=n_users)
+    db.session.execute(db.insert(User), [
+        {'name': f'Bench {i}', 'email': f'bench{i}@upwise.dev', 'password': 'bench',
+         'level': LEVELS[user_levels[i]], 'is_premium': rng.random() < 0.1}
+        for i in range(n_users)
+    ])
+    user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+
+    topic_weights = zipf_weights(len(TOPICS_TO_GENERATE), 1.0, rng)
+    rows = []
+    for i in range(n_questions):
+        options = [f'Opção {i}-{k}' for k in range(4)]
+        rows.append({
+            'statement': f'Questão sintética {i}', 'options': options, 'correct_answer': rng.choice(options),
+            'difficulty': DIFFICULTIES[i % 3], 'topic': rng.choices(TOPICS_TO_GENERATE, topic_weights)[0],
+            'random_key': rng.random(),
+        })
+    db.session.execute(db.insert(Question), rows)
+    questions = db.session.query(Question.id, Question.difficulty, Question.topic, Question.correct_answer) \
+        .order_by(Question.id).all()
+
+    # Questões por dificuldade, com popularidade Zipf dentro de cada uma
+    by_diff = defaultdict(list)
+    for q in questions: by_diff[DIFFICULTIES.index(q.difficulty)].append(q)
+    cum_by_diff = {d: cumulative(zipf_weights(len(qs), skew, rng)) for d, qs in by_diff.items()}
+    cum_users = cumulative(zipf_weights(n_users, skew, rng))
+
+    totals = defaultdict(lambda: [0, 0])
+    per_key = defaultdict(lambda: [0, 0])
+    daily = defaultdict(lambda: [0, 0])
+    now = datetime.utcnow()
+    batch = []
+
+    def flush():
+        if batch: db.session.execute(db.insert(UserActivity), batch)
+        batch.clear()
+
+    for ui in rng.choices(range(n_users), cum_weights=cum_users, k=n_activities):
+        level = user_levels[ui]
+        # Na maior parte das vezes a dificuldade acompanha o nível, às vezes revisa outra
+        diff = level if rng.random() < 0.8 else rng.randrange(3)
+        if diff not in by_diff: continue
+        q = rng.choices(by_diff[diff], cum_weights=cum_by_diff[diff])[0]
+        is_cor = rng.random() < P_CORRECT[level][diff]
+        ts = now - timedelta(days=days * rng.betavariate(1, 3), seconds=rng.randrange(86400))
+        uid = user_ids[ui]
+        batch.append({'user_id': uid, 'question_id': q.id, 'user_answer': q.correct_answer if is_cor else '-',
+                      'is_correct': is_cor, 'timestamp': ts})
+        for counter in (totals[uid], per_key[(uid, 'topic', q.topic)],
+                        per_key[(uid, 'difficulty', q.difficulty)], daily[(uid, ts.date(), q.topic or '')]):
+            counter[0] += 1
+            counter[1] += is_cor
+        if len(batch) >= batch_size: flush()
+    flush()
+
+    if totals:
+        db.session.execute(db.update(User), [
+            {'id': uid, 'total_activities': n, 'correct_answers': c, 'score': c * 10, 'accuracy': compute_accuracy(c, n)}
+            for uid, (n, c) in totals.items()
+        ])
+    for model, rows in ((UserStat, [{'user_id': u, 'dimension': d, 'key': k, 'attempts': n, 'correct': c}
+                                     for (u, d, k), (n, c) in per_key.items()]),
+                        (UserProgressDaily, [{'user_id': u, 'day': day, 'topic': t, 'attempts': n, 'correct': c}
+                                             for (u, day, t), (n, c) in daily.items()])):
+        for i in range(0, len(rows), batch_size):
+            db.session.execute(db.insert(model), rows[i:i + batch_size])
+    db.session.commit()
+
+    return {
+        'users': n_users, 'questions': n_questions, 'activities': sum(n for n, _ in totals.values()),
+        'active_users': len(totals), 'skew': skew, 'seed': seed,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=2000)
+    parser.add_argument('--activities', type=int, default=100000)
+    parser.add_argument('--skew', type=float, default=1.1, help="Expoente Zipf da atividade por usuário/questão.")
+    parser.add_argument('--seed', type=int, default=42)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--reset', action='store_true', help="Apaga e recria TODAS as tabelas antes de gerar.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    app = setup_app(args.database_url)
+    from models import db
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        summary = generate(args.users, args.questions, args.activities, seed=args.seed, skew=args.skew)
+        print(f"🧪 Dados gerados: {summary}")
@@ -0,0 +1,149 @@
+"""Roda EXPLAIN em cada consulta quente e falha se alguma cair em varredura sequencial.
+
+As consultas não são copiadas à mão: o script semeia o banco (datagen.py), faz as
+requisições quentes (login, next, submit, progress, conquistas, usuário) pelo app real,
+captura o SQL emitido (eventos do SQLAlchemy) e explica cada SELECT/UPDATE/DELETE com os
+mesmos parâmetros. Assim uma consulta nova em app.py entra no check automaticamente.
+
+- SQLite: EXPLAIN QUERY PLAN; falha em "SCAN <tabela>" (tabela inteira ou índice inteiro).
+- Postgres: EXPLAIN (FORMAT JSON) após ANALYZE, com enable_seqscan=off para que só falte
+  índice de verdade apareça como "Seq Scan" mesmo num banco de teste pequeno
+  (--planner-defaults mantém o planner como em produção, para bancos grandes).
+
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --database-url postgresql://localhost/upwise_bench --generate --activities 500000
+"""
+import argparse
+import json
+import sys
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from common import setup_app
+from datagen import add_arguments, generate
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def hot_requests(client, user_id, email):
+    """As requisições do caminho quente, na ordem de uma sessão real."""
+    yield 'login', lambda: client.post('/api/auth/login', json={'email': email, 'password': 'bench'})
+    yield 'user', lambda: client.get(f'/api/user/{user_id}')
+    questions = []
+    def next_round():
+        resp = client.get(f'/api/activities/next/{user_id}')
+        questions[:] = resp.get_json() or []
+        return resp
+    yield 'next', next_round
+    yield 'submit', lambda: client.post('/api/activities/submit', json={
+        'user_id': user_id, 'round_id': str(uuid.uuid4()),
+        'answers': [{'question_id': q['id'], 'answer': q['options'][0]} for q in questions]})
+    yield 'progress', lambda: client.get(f'/api/user/progress/{user_id}')
+    yield 'progress_window', lambda: client.get(f'/api/user/progress/{user_id}?start=2000-01-01&end=2100-01-01')
+    yield 'achievements', lambda: client.get(f'/api/user/achievements/{user_id}')
+
+
+def capture(app, user_id, email):
+    """Executa as requisições quentes e devolve [(rota, sql, parâmetros)] sem repetir SQL."""
+    captured, current = [], {}
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(EXPLAINED): return
+        captured.append((current['name'], statement, parameters))
+
+    client = app.test_client()
+    event.listen(Engine, 'before_cursor_execute', listener)
+    try:
+        for name, call in hot_requests(client, user_id, email):
+            current['name'] = name
+            resp = call()
+            if resp.status_code >= 400: raise SystemExit(f"❌ Requisição '{name}' falhou ({resp.status_code}).")
+    finally:
+        event.remove(Engine, 'before_cursor_execute', listener)
+
+    seen, unique = set(), []
+    for name, sql, params in captured:
+        if sql in seen: continue
+        seen.add(sql)
+        unique.append((name, sql, params))
+    return unique
+
+
+def sqlite_seq_scans(conn, sql, params):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    plan = [r[-1] for r in rows]
+    # "SEARCH t USING INDEX" é busca; "SCAN t" (com ou sem índice) percorre tudo
+    bad = [d for d in plan if d.startswith('SCAN ') and 'CONSTANT ROW' not in d]
+    return bad, plan
+
+
+def postgres_seq_scans(conn, sql, params):
+    raw = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql, params).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    bad, lines = [], []
+
+    def walk(node, depth=0):
+        label = node['Node Type'] + (f" on {node['Relation Name']}" if 'Relation Name' in node else '')
+        if 'Index Name' in node: label += f" using {node['Index Name']}"
+        lines.append('  ' * depth + label)
+        if node['Node Type'] == 'Seq Scan': bad.append(label)
+        for child in node.get('Plans', []): walk(child, depth + 1)
+
+    walk(plan[0]['Plan'])
+    return bad, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="Banco a usar (padrão: SQLite temporário). Precisa de --generate ou --reuse-data.")
+    parser.add_argument('--generate', action='store_true', help="Apaga e recria as tabelas de --database-url e gera os dados.")
+    parser.add_argument('--reuse-data', action='store_true', help="Usa os dados já existentes em --database-url.")
+    parser.add_argument('--planner-defaults', action='store_true', help="Postgres: não desliga enable_seqscan.")
+    parser.add_argument('--verbose', action='store_true', help="Mostra o plano de todas as consultas.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.database_url and not (args.generate or args.reuse_data):
+        raise SystemExit("Com --database-url, escolha --generate (recria as tabelas) ou --reuse-data.")
+
+    app = setup_app(args.database_url, model_latency=0)
+    from models import db, User
+    with app.app_context():
+        if not args.reuse_data:
+            if args.database_url:
+                db.drop_all()
+                db.create_all()
+            generate(args.users, args.questions, args.activities, seed=args.seed, skew=args.skew)
+            # Com habilidade calibrada, o next passa pela busca por faixa de dificuldade
+            from calibrate import calibrate
+            calibrate(full=True)
+        # Usuário mais ativo: o caso em que varrer o histórico dele mais dói
+        user_id, email = db.session.query(User.id, User.email).order_by(User.total_activities.desc()).first()
+
+    # Fora do app_context: cada requisição tem sua própria sessão, como em produção
+    queries = capture(app, user_id, email)
+
+    with app.app_context():
+        failures = 0
+        with db.engine.connect() as conn:
+            dialect = conn.dialect.name
+            if dialect == 'postgresql':
+                conn.exec_driver_sql('ANALYZE')
+                if not args.planner_defaults: conn.exec_driver_sql('SET enable_seqscan = off')
+            explain = postgres_seq_scans if dialect == 'postgresql' else sqlite_seq_scans
+            for name, sql, params in queries:
+                bad, plan = explain(conn, sql, params)
+                failures += bool(bad)
+                short = ' '.join(sql.split())
+                print(f"{'❌' if bad else '✅'} [{name}] {short[:110]}{'...' if len(short) > 110 else ''}")
+                if bad or args.verbose:
+                    for line in plan: print(f"      {line}")
+            conn.rollback()
+
+    print(f"\n{len(queries)} consultas explicadas ({dialect}), {failures} com varredura sequencial.")
+    if failures: sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
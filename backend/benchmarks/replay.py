@@ -0,0 +1,196 @@
+"""Replay de tráfego misto (login / next / submit / progress) contra o app Flask real.
+
+Gera os dados sintéticos (datagen.py) num SQLite temporário, ou usa --database-url
+(ex.: um Postgres local), troca o Gemini pelo modelo simulado e dispara as requisições
+pelo stack WSGI completo em vários workers. O relatório traz vazão e percentis por
+endpoint e pode ser salvo em JSON e comparado com o de outro commit.
+
+    python benchmarks/replay.py --requests 5000 --workers 8 --output bench-main.json
+    python benchmarks/replay.py --requests 5000 --workers 8 --compare bench-main.json
+"""
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from common import setup_app, summarize
+from datagen import add_arguments, cumulative, generate, zipf_weights
+
+ENDPOINTS = ['login', 'next', 'submit', 'progress', 'feedback']
+
+
+class Worker:
+    """Um cliente: escolhe usuário (com a mesma assimetria dos dados) e operação pelo mix."""
+
+    def __init__(self, app, users, cum_users, answers, mix, accuracy, follow_feedback, seed):
+        self.client = app.test_client()
+        self.users = users
+        self.cum_users = cum_users
+        self.answers = answers
+        self.ops, self.weights = zip(*mix.items())
+        self.accuracy = accuracy
+        self.follow_feedback = follow_feedback
+        self.rng = random.Random(seed)
+        self.pending = {}
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def timed(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        resp = getattr(self.client, method)(path, **kwargs)
+        body = resp.get_data()  # consome o corpo inteiro (streams SSE inclusive)
+        self.samples[endpoint].append(time.perf_counter() - start)
+        if resp.status_code >= 400: self.errors[endpoint] += 1
+        return resp, body
+
+    def step(self):
+        uid, email = self.rng.choices(self.users, cum_weights=self.cum_users)[0]
+        op = self.rng.choices(self.ops, self.weights)[0]
+        if op == 'login':
+            self.timed('login', 'post', '/api/auth/login', json={'email': email, 'password': 'bench'})
+        elif op == 'progress':
+            self.timed('progress', 'get', f'/api/user/progress/{uid}')
+        elif op == 'next' or uid not in self.pending:
+            _, body = self.timed('next', 'get', f'/api/activities/next/{uid}')
+            try: self.pending[uid] = json.loads(body)
+            except ValueError: self.pending.pop(uid, None)
+        else:
+            questions = self.pending.pop(uid)
+            answers = [{'question_id': q['id'],
+                        'answer': self.answers[q['id']] if self.rng.random() < self.accuracy else self.rng.choice(q['options'])}
+                       for q in questions]
+            resp, body = self.timed('submit', 'post', '/api/activities/submit',
+                                    json={'user_id': uid, 'answers': answers, 'round_id': str(uuid.uuid4())})
+            stream_id = resp.status_code == 200 and json.loads(body).get('feedback_stream_id')
+            if stream_id and self.follow_feedback:
+                self.timed('feedback', 'get', f'/api/activities/feedback/{stream_id}')
+
+    def run(self, n):
+        for _ in range(n): self.step()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS[:4]: raise SystemExit(f"Operação desconhecida no --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_workers(workers, per_worker):
+    threads = [threading.Thread(target=w.run, args=(per_worker,)) for w in workers]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start
+
+
+def compare(report, baseline):
+    print(f"\n📊 Comparação com {baseline['meta'].get('commit') or 'baseline'}:")
+    print(f"{'endpoint':>10} {'p50 (ms)':>20} {'p95 (ms)':>20} {'vazão (/s)':>22}")
+    fmt = lambda old, new: f"{old}→{new} ({(new - old) / old * 100:+.0f}%)" if old and new is not None else f"{old}→{new}"
+    for ep in ['all'] + ENDPOINTS:
+        new = report['totals'] if ep == 'all' else report['endpoints'].get(ep)
+        old = baseline['totals'] if ep == 'all' else baseline['endpoints'].get(ep)
+        if not new or not old or not new.get('count') or not old.get('count'): continue
+        print(f"{ep:>10} {fmt(old['p50_ms'], new['p50_ms']):>20} {fmt(old['p95_ms'], new['p95_ms']):>20} "
+              f"{fmt(old['throughput_per_s'], new['throughput_per_s']):>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help="Banco a usar (padrão: SQLite temporário). Precisa de --generate ou --reuse-data.")
+    parser.add_argument('--generate', action='store_true', help="Apaga e recria as tabelas de --database-url e gera os dados.")
+    parser.add_argument('--reuse-data', action='store_true', help="Usa os dados já existentes em --database-url.")
+    add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=2000, help="Requisições medidas (além do aquecimento).")
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mix', default='login=1,next=4,submit=4,progress=1', help="Pesos das operações.")
+    parser.add_argument('--accuracy', type=float, default=0.6, help="Chance de o cliente acertar cada questão.")
+    parser.add_argument('--model-latency', type=float, default=0.05, help="Latência simulada do Gemini (s).")
+    parser.add_argument('--feedback', action='store_true', help="Segue o stream SSE do feedback após o submit.")
+    parser.add_argument('--output', help="Grava o relatório em JSON.")
+    parser.add_argument('--compare', help="Relatório JSON de outro commit para comparar.")
+    args = parser.parse_args()
+    if args.database_url and not (args.generate or args.reuse_data):
+        raise SystemExit("Com --database-url, escolha --generate (recria as tabelas) ou --reuse-data.")
+
+    app = setup_app(args.database_url, args.model_latency)
+    from models import db, User, Question
+    from app import round_prefetch
+    with app.app_context():
+        data = None
+        if not args.reuse_data:
+            if args.database_url:
+                db.drop_all()
+                db.create_all()
+            start = time.perf_counter()
+            data = generate(args.users, args.questions, args.activities, seed=args.seed, skew=args.skew)
+            print(f"🧪 Dados gerados em {time.perf_counter() - start:.1f}s: {data}")
+        users = db.session.query(User.id, User.email).order_by(User.id).all()
+        answers = dict(db.session.query(Question.id, Question.correct_answer))
+        dialect = db.engine.dialect.name
+
+    rng = random.Random(args.seed)
+    cum_users = cumulative(zipf_weights(len(users), args.skew, rng))
+    mix = parse_mix(args.mix)
+    workers = [Worker(app, [tuple(u) for u in users], cum_users, answers, mix, args.accuracy, args.feedback, args.seed + i)
+               for i in range(args.workers)]
+
+    run_workers(workers, max(1, args.warmup // args.workers))
+    for w in workers:
+        w.samples.clear()
+        w.errors.clear()
+
+    per_worker = max(1, args.requests // args.workers)
+    print(f"🏁 {per_worker * args.workers} operações em {args.workers} workers ({dialect})...")
+    wall = run_workers(workers, per_worker)
+
+    samples, errors = defaultdict(list), defaultdict(int)
+    for w in workers:
+        for ep, values in w.samples.items(): samples[ep] += values
+        for ep, n in w.errors.items(): errors[ep] += n
+
+    report = {
+        'meta': {
+            'commit': git_commit(), 'timestamp': datetime.now().isoformat(timespec='seconds'), 'database': dialect,
+            'data': data, 'requests': per_worker * args.workers, 'workers': args.workers, 'mix': mix,
+            'model_latency_s': args.model_latency, 'feedback': args.feedback, 'wall_s': round(wall, 3),
+        },
+        'totals': {**summarize([v for vs in samples.values() for v in vs], wall), 'errors': sum(errors.values())},
+        'endpoints': {ep: {**summarize(samples[ep], wall), 'errors': errors[ep]} for ep in ENDPOINTS if samples[ep]},
+        'round_prefetch': round_prefetch.stats(),
+    }
+
+    print(f"\n{'endpoint':>10} {'n':>7} {'req/s':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8} {'erros':>6}")
+    for ep, s in [('all', report['totals'])] + list(report['endpoints'].items()):
+        print(f"{ep:>10} {s['count']:>7} {s['throughput_per_s']:>8} {s['p50_ms']:>8} {s['p90_ms']:>8} "
+              f"{s['p95_ms']:>8} {s['p99_ms']:>8} {s['max_ms']:>8} {s['errors']:>6}")
+    pf = report['round_prefetch']
+    print(f"\n⚡ Rodadas pré-montadas: hit rate {pf['hit_rate']}, {pf['hits']} hits, {pf['saved_total_s']}s poupados")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Relatório salvo em {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Verifica o ModelRouter (gemini_router.py) contra um Gemini simulado com falhas injetadas.
+
+Cenários: circuit breaker (abre após falhas seguidas, half-open com uma única chamada de
+teste mesmo sob concorrência, fecha no sucesso e reabre na falha), prazo por chamada, hedge
+e cobrança no AiScheduler (uma admissão por tentativa, inclusive fallback e hedge).
+Não usa rede nem banco. Falha (exit 1) se algum cenário não se comportar como esperado.
+
+    python benchmarks/router_faults.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_scheduler import AiScheduler
+from gemini_router import ModelRouter
+
+
+class FakeBackend:
+    """Fábrica de clientes falsos: cada modelo tem latência e modo ('ok' ou 'fail') ajustáveis."""
+
+    def __init__(self):
+        self.latency = {}
+        self.mode = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        backend = self
+
+        class Response:
+            text = f"resposta de {name}"
+
+        class Model:
+            def generate_content(self, prompt, request_options=None, **kwargs):
+                with backend._lock:
+                    backend.calls[name] = backend.calls.get(name, 0) + 1
+                latency = backend.latency.get(name, 0.0)
+                timeout = (request_options or {}).get('timeout')
+                # Como o SDK: a chamada é abortada quando passa do prazo
+                if timeout is not None and latency > timeout:
+                    time.sleep(timeout)
+                    raise TimeoutError(f"{name}: prazo de {timeout}s esgotado")
+                time.sleep(latency)
+                if backend.mode.get(name) == 'fail': raise RuntimeError(f"{name}: 503 simulado")
+                return Response()
+        return Model()
+
+
+def make_router(**kwargs):
+    backend = FakeBackend()
+    options = dict(deadline=1.0, failure_threshold=2, reset_timeout=0.2)
+    options.update(kwargs)
+    return ModelRouter(['a', 'b'], client_factory=backend, **options), backend
+
+
+def check_breaker(errors):
+    # Com um modelo degradado o roteador passa a preferir b; por isso o limiar aqui é 1
+    router, backend = make_router(failure_threshold=1)
+    backend.mode['a'] = 'fail'
+    if router.generate('p') != "resposta de b": errors.append("breaker: fallback para b não respondeu")
+    if router.state()['models']['a']['state'] != 'open':
+        errors.append("breaker: a não abriu após a falha")
+
+    calls = backend.calls.get('a', 0)
+    router.generate('p')
+    if backend.calls.get('a', 0) != calls: errors.append("breaker: chamada enviada a um modelo com circuito aberto")
+
+    # Half-open: com 8 chamadas simultâneas, só uma testa o modelo a
+    time.sleep(0.25)
+    backend.mode['a'] = 'ok'
+    backend.latency['a'] = 0.2
+    calls = backend.calls.get('a', 0)
+    threads = [threading.Thread(target=router.generate, args=('p',)) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    probes = backend.calls.get('a', 0) - calls
+    if probes != 1: errors.append(f"half-open: {probes} chamadas de teste simultâneas (esperado 1)")
+    if router.state()['models']['a']['state'] != 'closed': errors.append("half-open: sucesso do teste não fechou o circuito")
+
+    # Half-open com falha: volta a abrir
+    backend.mode['a'] = 'fail'
+    backend.latency['a'] = 0.0
+    router.generate('p')
+    time.sleep(0.25)
+    router.generate('p')
+    a = router.state()['models']['a']
+    if a['state'] != 'open' or a.get('probing'): errors.append(f"half-open: falha do teste deixou o circuito {a['state']}")
+    print(f"🔌 breaker: {backend.calls.get('a', 0)} chamadas em a, {backend.calls.get('b', 0)} em b")
+
+
+def check_deadline(errors):
+    router, backend = make_router(deadline=0.1)
+    backend.latency['a'] = 1.0
+    start = time.perf_counter()
+    text = router.generate('p')
+    elapsed = time.perf_counter() - start
+    if text != "resposta de b": errors.append("prazo: não caiu para b quando a passou do prazo")
+    if elapsed > 0.5: errors.append(f"prazo: chamada levou {elapsed:.2f}s com prazo de 0.1s")
+    if router.state()['models']['a']['failures'] != 1: errors.append("prazo: estouro de prazo não contou como falha")
+    print(f"⏱️  prazo: resposta em {elapsed:.2f}s")
+
+
+def check_hedge(errors):
+    router, backend = make_router(hedge=True, hedge_min_delay=0.05)
+    backend.latency['a'] = 0.5
+    start = time.perf_counter()
+    text = router.generate('p')
+    elapsed = time.perf_counter() - start
+    state = router.state()
+    if text != "resposta de b": errors.append("hedge: resposta não veio do secundário mais rápido")
+    if elapsed > 0.3: errors.append(f"hedge: chamada levou {elapsed:.2f}s (principal leva 0.5s)")
+    if (state['hedges_fired'], state['hedges_won']) != (1, 1):
+        errors.append(f"hedge: fired={state['hedges_fired']} won={state['hedges_won']} (esperado 1/1)")
+
+    # Principal rápido: o hedge não dispara
+    backend.latency['a'] = 0.0
+    router.generate('p')
+    if router.state()['hedges_fired'] != 1: errors.append("hedge: disparou com o principal abaixo do atraso")
+    print(f"🏁 hedge: resposta em {elapsed:.2f}s")
+
+
+def check_scheduler(errors):
+    scheduler = AiScheduler(rpm=1000, tpm=10 ** 9, max_concurrency=10)
+    admitted = lambda: scheduler.stats()['classes']['interactive']['admitted']
+
+    router, backend = make_router(scheduler=scheduler)
+    backend.mode['a'] = 'fail'
+    router.generate('p')
+    if admitted() != 2: errors.append(f"agendador: fallback a -> b cobrou {admitted()} tentativas (esperado 2)")
+
+    router, backend = make_router(scheduler=scheduler, hedge=True, hedge_min_delay=0.05)
+    backend.latency['a'] = 0.3
+    router.generate('p')
+    if scheduler.stats()['active'] != 1: errors.append("agendador: principal ainda rodando não ocupa vaga")
+    time.sleep(0.35)
+    if admitted() != 4: errors.append(f"agendador: hedge cobrou {admitted() - 2} tentativas (esperado 2)")
+    if scheduler.stats()['active'] != 0: errors.append("agendador: vaga não liberada depois do hedge")
+    charged = admitted()
+
+    # Sem vaga livre, o hedge não dispara (e não espera na fila)
+    scheduler = AiScheduler(rpm=1000, tpm=10 ** 9, max_concurrency=1)
+    router, backend = make_router(scheduler=scheduler, hedge=True, hedge_min_delay=0.05)
+    backend.latency['a'] = 0.2
+    text = router.generate('p')
+    if text != "resposta de a" or router.state()['hedges_fired'] != 0:
+        errors.append("agendador: hedge disparou sem vaga de concorrência")
+    print(f"🎟️  agendador: {charged} tentativas cobradas no cenário de fallback + hedge")
+
+
+def main():
+    errors = []
+    for check in (check_breaker, check_deadline, check_hedge, check_scheduler):
+        check(errors)
+    for e in errors: print(f"❌ {e}")
+    if errors: sys.exit(1)
+    print("✅ Roteador do Gemini se comporta como esperado.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Verifica o orçamento de inicialização do backend (import + create_app + primeira requisição).
+
+Cada medição roda num processo Python novo (import frio). Falha (exit 1) se algum tempo
+passar do orçamento, se o SDK do Gemini, PyMongo, pandas ou numpy forem importados,
+ou se alguma thread de background for iniciada só por subir o app.
+
+    python benchmarks/startup_budget.py --import-budget 1.0 --cold-start-budget 1.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependências pesadas / de serviços externos que só podem carregar no primeiro uso
+LAZY_MODULES = ['google.generativeai', 'pymongo', 'pandas', 'numpy']
+
+PROBE = """
+import json, sys, threading, time
+t0 = time.perf_counter()
+import app as backend
+t1 = time.perf_counter()
+application = backend.create_app()
+t2 = time.perf_counter()
+status = application.test_client().get('/api/pool/stats').status_code
+t3 = time.perf_counter()
+print(json.dumps({
+    'import_s': t1 - t0, 'create_app_s': t2 - t1, 'first_request_s': t3 - t2, 'status': status,
+    'loaded': [m for m in %r if m in sys.modules],
+    'threads': [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+}))
+"""
+
+
+def probe():
+    env = dict(os.environ, DATABASE_URL='sqlite://', GOOGLE_API_KEY='startup-check', PYTHONDONTWRITEBYTECODE='1')
+    out = subprocess.run([sys.executable, '-c', PROBE % LAZY_MODULES], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-budget', type=float, default=1.0, help="Máximo (s) para `import app`.")
+    parser.add_argument('--cold-start-budget', type=float, default=1.5, help="Máximo (s) para import + create_app + 1ª requisição.")
+    parser.add_argument('--runs', type=int, default=3, help="Processos medidos (usa a mediana).")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    median = lambda key: sorted(r[key] for r in runs)[len(runs) // 2]
+    import_s = median('import_s')
+    cold_s = sorted(r['import_s'] + r['create_app_s'] + r['first_request_s'] for r in runs)[len(runs) // 2]
+    print(f"⏱️  import app: {import_s:.3f}s (orçamento {args.import_budget}s)")
+    print(f"⏱️  create_app: {median('create_app_s'):.3f}s | 1ª requisição: {median('first_request_s'):.3f}s")
+    print(f"⏱️  cold start: {cold_s:.3f}s (orçamento {args.cold_start_budget}s)")
+
+    errors = []
+    if import_s > args.import_budget: errors.append(f"import app levou {import_s:.3f}s")
+    if cold_s > args.cold_start_budget: errors.append(f"cold start levou {cold_s:.3f}s")
+    for r in runs:
+        if r['status'] != 200: errors.append(f"primeira requisição retornou {r['status']}")
+        if r['loaded']: errors.append(f"módulos carregados na inicialização: {', '.join(r['loaded'])}")
+        if r['threads']: errors.append(f"threads iniciadas na inicialização: {', '.join(r['threads'])}")
+
+    for e in sorted(set(errors)): print(f"❌ {e}")
+    if errors: sys.exit(1)
+    print("✅ Inicialização dentro do orçamento.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app import create_app
+from models import db, User, Question, UserActivity, CalibrationCheckpoint
+
+CHECKPOINT = 'elo'
+BOUND = 6.0  # limite da escala logit
+
+# Pontos de partida: o rótulo pedido à IA e o nível atual do usuário
+DIFFICULTY_PRIOR = {'fácil': -1.0, 'médio': 0.0, 'difícil': 1.0}
+LEVEL_PRIOR = {'Iniciante': -0.5, 'Intermediário': 0.0, 'Avançado': 0.5}
+
+# Respostas por passo Elo (independente do tamanho do bloco lido)
+STEP_ROWS = 1000
+
+# Memória estimada por linha do bloco de user_activities (tupla do driver + vetores NumPy)
+BYTES_PER_ROW = 300
+
+
+class Params:
+    """Um parâmetro por id (vetor denso), o número de respostas já usadas e a marca de alterados."""
+
+    def __init__(self, model, value_attr, count_attr, label_attr, priors, reset=False):
+        self.model = model
+        self.value_attr, self.count_attr = value_attr, count_attr
+        self.label_attr = label_attr
+        self.priors = priors
+        self.reset = reset
+        self.value = np.zeros(1)
+        self.count = np.zeros(1, dtype=np.int64)
+        self.dirty = np.zeros(1, dtype=bool)
+        self.loaded_max = 0
+
+    @property
+    def nbytes(self):
+        return self.value.nbytes + self.count.nbytes + self.dirty.nbytes
+
+    def ensure(self, max_id, batch_size=10000):
+        """Carrega do banco (valor salvo ou prior) os ids até max_id ainda não carregados."""
+        if max_id <= self.loaded_max: return
+        size = max_id + 1
+        for name in ('value', 'count', 'dirty'):
+            arr = getattr(self, name)
+            grown = np.zeros(size, dtype=arr.dtype)
+            grown[:len(arr)] = arr
+            setattr(self, name, grown)
+
+        m = self.model
+        cols = (m.id, getattr(m, self.value_attr), getattr(m, self.count_attr), getattr(m, self.label_attr))
+        rows = db.session.query(*cols).filter(m.id > self.loaded_max, m.id <= max_id).yield_per(batch_size)
+        for i, value, count, label in rows:
+            if self.reset or value is None:
+                self.value[i], self.count[i] = self.priors.get(label, 0.0), 0
+                # Refit completo regrava tudo, inclusive quem ficou sem respostas
+                self.dirty[i] = self.reset
+            else:
+                self.value[i], self.count[i] = value, count or 0
+        self.loaded_max = max_id
+
+    def save(self, batch_size=5000):
+        ids = np.flatnonzero(self.dirty)
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            db.session.execute(db.update(self.model), [
+                {'id': int(i), self.value_attr: float(self.value[i]), self.count_attr: int(self.count[i])} for i in chunk
+            ])
+        self.dirty[:] = False
+        return len(ids)
+
+
+def elo_step(users, questions, user_idx, question_idx, y, k_user, k_question, decay):
+    """Atualização Elo/Rasch vetorizada de um bloco: P(acerto) = sigmoid(habilidade - dificuldade).
+
+    Cada usuário/questão recebe a soma dos erros do bloco vezes um K que decai com o número
+    de respostas já usadas (avaliado no meio do bloco, aproximando a versão sequencial).
+    Retorna (log-loss, acertos de previsão) do bloco, medidos antes da atualização.
+    """
+    p = 1.0 / (1.0 + np.exp(questions.value[question_idx] - users.value[user_idx]))
+    err = y - p
+    eps = 1e-9
+    loss = float(-np.sum(y * np.log(p + eps) + (1 - y) * np.log(1 - p + eps)))
+    hits = int(np.sum((p >= 0.5) == (y == 1)))
+
+    for params, idx, sign, k in ((users, user_idx, 1.0, k_user), (questions, question_idx, -1.0, k_question)):
+        uniq, inv = np.unique(idx, return_inverse=True)
+        n = np.bincount(inv)
+        total_err = np.bincount(inv, weights=err)
+        rate = k / (1.0 + decay * (params.count[uniq] + n / 2.0))
+        params.value[uniq] = np.clip(params.value[uniq] + sign * rate * total_err, -BOUND, BOUND)
+        params.count[uniq] += n
+        params.dirty[uniq] = True
+    return loss, hits
+
+
+def save(users, questions, checkpoint, last_id, processed):
+    saved_users, saved_questions = users.save(), questions.save()
+    checkpoint.last_activity_id = last_id
+    checkpoint.answers_processed = processed
+    checkpoint.updated_at = datetime.utcnow()
+    db.session.commit()
+    return saved_users, saved_questions
+
+
+def calibrate(full=False, memory_mb=256, chunk_rows=None, checkpoint_every=10,
+              k_user=0.4, k_question=0.2, decay=0.05, step_rows=STEP_ROWS):
+    """Calibra a partir de user_activities em blocos (keyset por id) e grava os resultados.
+
+    O bloco lido do banco segue o orçamento de memória; dentro dele, cada passo Elo usa só
+    step_rows respostas, em ordem de id (passos grandes somam erros de um ponto de partida
+    velho e pioram o ajuste).
+
+    Incremental (padrão): parte dos valores salvos e lê só as respostas depois do checkpoint.
+    full=True: volta aos priors e reprocessa o histórico inteiro.
+    """
+    checkpoint = CalibrationCheckpoint.query.filter_by(name=CHECKPOINT).first()
+    if checkpoint is None:
+        checkpoint = CalibrationCheckpoint(name=CHECKPOINT, last_activity_id=0, answers_processed=0)
+        db.session.add(checkpoint)
+    if full:
+        checkpoint.last_activity_id, checkpoint.answers_processed = 0, 0
+
+    users = Params(User, 'ability', 'ability_count', 'level', LEVEL_PRIOR, reset=full)
+    questions = Params(Question, 'calibrated_difficulty', 'calibration_count', 'difficulty', DIFFICULTY_PRIOR, reset=full)
+    users.ensure(db.session.query(db.func.max(User.id)).scalar() or 0)
+    questions.ensure(db.session.query(db.func.max(Question.id)).scalar() or 0)
+
+    if chunk_rows is None:
+        free = memory_mb * 1024 * 1024 - users.nbytes - questions.nbytes
+        chunk_rows = max(1000, free // BYTES_PER_ROW)
+    print(f"📐 Calibração {'completa' if full else 'incremental'} a partir da atividade {checkpoint.last_activity_id}, "
+          f"blocos de {chunk_rows} respostas (parâmetros: {(users.nbytes + questions.nbytes) / 1e6:.1f} MB).")
+
+    last_id, processed = checkpoint.last_activity_id, checkpoint.answers_processed
+    seen = loss = hits = chunks = saved_users = saved_questions = 0
+    start = time.perf_counter()
+    while True:
+        rows = db.session.query(UserActivity.id, UserActivity.user_id, UserActivity.question_id, UserActivity.is_correct) \
+            .filter(UserActivity.id > last_id).order_by(UserActivity.id).limit(chunk_rows).all()
+        if not rows: break
+        block = np.array(rows, dtype=np.int64)
+        del rows
+        ids, user_idx, question_idx, y = block[:, 0], block[:, 1], block[:, 2], block[:, 3].astype(float)
+        users.ensure(int(user_idx.max()))
+        questions.ensure(int(question_idx.max()))
+
+        for i in range(0, len(block), step_rows):
+            step_loss, step_hits = elo_step(users, questions, user_idx[i:i + step_rows], question_idx[i:i + step_rows],
+                                            y[i:i + step_rows], k_user, k_question, decay)
+            loss, hits = loss + step_loss, hits + step_hits
+        seen += len(block)
+        last_id, processed = int(ids[-1]), processed + len(block)
+        chunks += 1
+        if chunks % checkpoint_every == 0:
+            n_users, n_questions = save(users, questions, checkpoint, last_id, processed)
+            saved_users, saved_questions = saved_users + n_users, saved_questions + n_questions
+            print(f"   💾 Checkpoint na atividade {last_id} ({seen} respostas, {seen / (time.perf_counter() - start):.0f}/s)")
+
+    n_users, n_questions = save(users, questions, checkpoint, last_id, processed)
+    return {
+        'answers': seen, 'user_writes': saved_users + n_users, 'question_writes': saved_questions + n_questions,
+        'last_activity_id': last_id, 'log_loss': round(loss / seen, 4) if seen else None,
+        'prediction_accuracy': round(hits / seen, 4) if seen else None,
+        'elapsed_s': round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibra a dificuldade das questões e a habilidade dos usuários (Elo/Rasch) a partir do histórico.")
+    parser.add_argument('--full', action='store_true', help="Recomeça dos priors e reprocessa todo o histórico.")
+    parser.add_argument('--memory-mb', type=int, default=256, help="Orçamento de memória (define o tamanho dos blocos).")
+    parser.add_argument('--chunk-rows', type=int, help="Tamanho fixo dos blocos (ignora --memory-mb).")
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="Grava resultados e checkpoint a cada N blocos.")
+    parser.add_argument('--step-rows', type=int, default=STEP_ROWS, help="Respostas por passo de atualização.")
+    parser.add_argument('--k-user', type=float, default=0.4)
+    parser.add_argument('--k-question', type=float, default=0.2)
+    parser.add_argument('--decay', type=float, default=0.05, help="Quanto o passo encolhe por resposta já usada.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            summary = calibrate(full=args.full, memory_mb=args.memory_mb, chunk_rows=args.chunk_rows,
+                                checkpoint_every=args.checkpoint_every, k_user=args.k_user,
+                                k_question=args.k_question, decay=args.decay, step_rows=args.step_rows)
+            print(f"✅ Calibração concluída: {summary}")
+        except Exception as e:
+            print(f"❌ Erro na calibração: {e}")
+            db.session.rollback()
@@ -0,0 +1,146 @@
+import argparse
+from datetime import date, datetime
+
+from app import create_app
+from models import db, Question, UserActivity, UserSeenQuestion, UserActivitySummary, CalibrationCheckpoint
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+def add_months(d, n):
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+def _at(d):
+    return datetime(d.year, d.month, d.day)
+
+def _insert(model):
+    """INSERT com ON CONFLICT do dialeto atual (Postgres ou SQLite)."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model.__table__)
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql': return False
+    return bool(db.session.execute(db.text(
+        "SELECT c.relkind = 'p' FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'user_activities' AND n.nspname = current_schema()")).scalar())
+
+def partition_name(month):
+    return f"user_activities_p{month:%Y%m}"
+
+def existing_partitions():
+    return {name for (name,) in db.session.execute(db.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'user_activities'::regclass"))}
+
+
+def ensure_partitions(months_ahead=3):
+    """Cria as partições do mês atual até months_ahead à frente (Postgres particionado)."""
+    if not is_partitioned(): return []
+    have, created = existing_partitions(), []
+    month = month_start(date.today())
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        if name not in have:
+            # Falha se a partição default já tiver linhas desse mês; nesse caso só avisa
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.text(
+                        f"CREATE TABLE {name} PARTITION OF user_activities FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"))
+                created.append(name)
+            except Exception as e:
+                print(f"⚠️ Não foi possível criar {name}: {e}")
+        month = add_months(month, 1)
+    db.session.commit()
+    return created
+
+
+def compacted_until():
+    """Primeiro mês ainda não compactado (None se nada foi compactado)."""
+    last = db.session.query(db.func.max(UserActivitySummary.month)).scalar()
+    return add_months(last, 1) if last else None
+
+
+def compact_month(month, dry_run=False):
+    """Compacta as atividades de um mês numa transação: vistas + resumo, depois remove as linhas."""
+    start, end = month, add_months(month, 1)
+    in_month = (UserActivity.timestamp >= _at(start), UserActivity.timestamp < _at(end))
+    rows = db.session.query(db.func.count(UserActivity.id)).filter(*in_month).scalar()
+    if dry_run or not rows: return rows
+
+    seen = _insert(UserSeenQuestion).from_select(
+        ['user_id', 'question_id'],
+        db.select(UserActivity.user_id, UserActivity.question_id).where(*in_month).distinct(),
+    ).on_conflict_do_nothing()
+    db.session.execute(seen)
+
+    correct = db.func.sum(db.case((UserActivity.is_correct, 1), else_=0))
+    topic, difficulty = db.func.coalesce(Question.topic, ''), db.func.coalesce(Question.difficulty, '')
+    grouped = db.select(
+        UserActivity.user_id, db.literal(start, db.Date), topic, difficulty, db.func.count(UserActivity.id), correct,
+    ).join(Question, UserActivity.question_id == Question.id).where(*in_month) \
+        .group_by(UserActivity.user_id, topic, difficulty)
+    summary = _insert(UserActivitySummary).from_select(
+        ['user_id', 'month', 'topic', 'difficulty', 'attempts', 'correct'], grouped)
+    # Se o mês já tinha resumo (linhas atrasadas que caíram na partição default), soma
+    db.session.execute(summary.on_conflict_do_update(
+        index_elements=['user_id', 'month', 'topic', 'difficulty'],
+        set_={'attempts': UserActivitySummary.attempts + summary.excluded.attempts,
+              'correct': UserActivitySummary.correct + summary.excluded.correct},
+    ))
+
+    name = partition_name(month)
+    if is_partitioned() and name in existing_partitions():
+        db.session.execute(db.text(f"ALTER TABLE user_activities DETACH PARTITION {name}"))
+        db.session.execute(db.text(f"DROP TABLE {name}"))
+    # Sem partição própria (SQLite, ou linhas na default): apaga pela faixa de tempo
+    db.session.query(UserActivity).filter(*in_month).delete(synchronize_session=False)
+    db.session.commit()
+    return rows
+
+
+def compact(keep_months=12, dry_run=False, check_calibration=True):
+    """Compacta todos os meses anteriores aos últimos keep_months (o mês atual conta como um)."""
+    cutoff = add_months(month_start(date.today()), -(keep_months - 1))
+    oldest = db.session.query(db.func.min(UserActivity.timestamp)).filter(UserActivity.timestamp < _at(cutoff)).scalar()
+    if oldest is None:
+        print(f"✅ Nada a compactar antes de {cutoff}.")
+        return 0
+
+    # A calibração lê user_activities por id: não apaga respostas que ela ainda não processou
+    newest_id = db.session.query(db.func.max(UserActivity.id)).filter(UserActivity.timestamp < _at(cutoff)).scalar()
+    checkpoint = CalibrationCheckpoint.query.filter_by(name='elo').first()
+    if check_calibration and (not checkpoint or checkpoint.last_activity_id < newest_id):
+        raise RuntimeError(f"Calibração não processou até a atividade {newest_id}: rode calibrate.py antes.")
+
+    total, month = 0, month_start(oldest)
+    while month < cutoff:
+        n = compact_month(month, dry_run)
+        if n: print(f"   {'🔎' if dry_run else '🗜️'} {month:%Y-%m}: {n} atividades")
+        total += n
+        month = add_months(month, 1)
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Retenção de user_activities: compacta meses antigos em resumos por usuário.")
+    parser.add_argument('--keep-months', type=int, default=12, help="Meses recentes mantidos linha a linha (inclui o atual).")
+    parser.add_argument('--ensure-partitions', type=int, default=3, metavar='N', help="Postgres: cria partições até N meses à frente.")
+    parser.add_argument('--dry-run', action='store_true', help="Só conta o que seria compactado.")
+    parser.add_argument('--ignore-calibration', action='store_true', help="Compacta mesmo sem a calibração em dia.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            if not args.dry_run:
+                created = ensure_partitions(args.ensure_partitions)
+                if created: print(f"🧱 Partições criadas: {', '.join(created)}")
+            total = compact(args.keep_months, args.dry_run, check_calibration=not args.ignore_calibration)
+            print(f"✅ {'Seriam compactadas' if args.dry_run else 'Compactadas'} {total} atividades.")
+        except Exception as e:
+            print(f"❌ Erro na compactação: {e}")
+            db.session.rollback()
@@ -6,4 +6,87 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = 'chave-secreta-faculdade-upwise'
\ No newline at end of file
+    SECRET_KEY = 'chave-secreta-faculdade-upwise'
+    GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+
+    # Reabastecimento do banco de questões em background
+    QUESTION_POOL_LOW_WATER = int(os.getenv('QUESTION_POOL_LOW_WATER', 3))
+    QUESTION_POOL_BATCH_SIZE = int(os.getenv('QUESTION_POOL_BATCH_SIZE', 5))
+    QUESTION_POOL_INTERVAL = int(os.getenv('QUESTION_POOL_INTERVAL', 60))
+    # Estoque medido como inéditas para os N usuários mais adiantados entre os ativos nos últimos dias
+    QUESTION_POOL_ACTIVE_USERS = int(os.getenv('QUESTION_POOL_ACTIVE_USERS', 50))
+    QUESTION_POOL_ACTIVE_DAYS = int(os.getenv('QUESTION_POOL_ACTIVE_DAYS', 7))
+
+    # Geração em lote (uma chamada à IA para várias questões)
+    QUESTION_BATCH_SIZE = int(os.getenv('QUESTION_BATCH_SIZE', 10))
+    SEED_MAX_CONCURRENCY = int(os.getenv('SEED_MAX_CONCURRENCY', 4))
+
+    # Cache em memória das questões (0 = carrega o banco inteiro; > 0 = LRU limitado)
+    QUESTION_CATALOG_MAX_ENTRIES = int(os.getenv('QUESTION_CATALOG_MAX_ENTRIES', 0))
+
+    # Logs de atividade para o datalake (MongoDB), enviados em background
+    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+    ACTIVITY_LOG_ENABLED = os.getenv('ACTIVITY_LOG_ENABLED', '1') == '1'
+    ACTIVITY_LOG_SPOOL_PATH = os.getenv('ACTIVITY_LOG_SPOOL_PATH', 'activity_logs.spool.jsonl')
+    ACTIVITY_LOG_MAX_QUEUE = int(os.getenv('ACTIVITY_LOG_MAX_QUEUE', 10000))
+    ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 200))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0))
+
+    # Cache do feedback do tutor IA (LRU em memória + tabela ai_feedback)
+    FEEDBACK_CACHE_MAX_ENTRIES = int(os.getenv('FEEDBACK_CACHE_MAX_ENTRIES', 4096))
+    FEEDBACK_CACHE_TTL = int(os.getenv('FEEDBACK_CACHE_TTL', 0))  # segundos; 0 = sem expiração
+    FEEDBACK_PROMPT_VERSION = int(os.getenv('FEEDBACK_PROMPT_VERSION', 1))
+    FEEDBACK_WARM_ON_GENERATE = os.getenv('FEEDBACK_WARM_ON_GENERATE', '0') == '1'
+
+    # Roteador de modelos Gemini (ordem de preferência, prazo, circuit breaker e hedge)
+    GEMINI_MODELS = [m.strip() for m in os.getenv('GEMINI_MODELS', 'gemini-2.0-flash,gemini-1.5-flash-latest,gemini-1.5-flash,gemini-2.5-flash').split(',') if m.strip()]
+    GEMINI_DEADLINE = float(os.getenv('GEMINI_DEADLINE', 20))
+    GEMINI_BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', 3))
+    GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', 30))
+    GEMINI_HEDGE = os.getenv('GEMINI_HEDGE', '0') == '1'
+    GEMINI_HEDGE_PERCENTILE = int(os.getenv('GEMINI_HEDGE_PERCENTILE', 95))
+    GEMINI_HEDGE_MIN_DELAY = float(os.getenv('GEMINI_HEDGE_MIN_DELAY', 2.0))
+
+    # Agendador das chamadas de IA (prioridades interactive > refill > batch)
+    AI_REQUESTS_PER_MINUTE = int(os.getenv('AI_REQUESTS_PER_MINUTE', 60))
+    AI_TOKENS_PER_MINUTE = int(os.getenv('AI_TOKENS_PER_MINUTE', 120000))
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 4))
+    AI_INTERACTIVE_RESERVE = float(os.getenv('AI_INTERACTIVE_RESERVE', 0.2))  # fração do orçamento só para o interativo
+    AI_MAX_WAIT_INTERACTIVE = float(os.getenv('AI_MAX_WAIT_INTERACTIVE', 30))
+    AI_MAX_WAIT_REFILL = float(os.getenv('AI_MAX_WAIT_REFILL', 15))
+    AI_MAX_WAIT_BATCH = float(os.getenv('AI_MAX_WAIT_BATCH', 120))
+
+    # Validade (segundos) do id de stream SSE do feedback devolvido pelo submit
+    FEEDBACK_STREAM_MAX_AGE = int(os.getenv('FEEDBACK_STREAM_MAX_AGE', 600))
+
+    # Transporte do cliente Gemini ('grpc' ou 'rest'); serve.py usa 'rest' no modo async.
+    # O SDK só é importado e configurado quando o primeiro cliente é criado (gemini_router.py)
+    GEMINI_TRANSPORT = os.getenv('GEMINI_TRANSPORT', 'grpc')
+
+    # Métricas Prometheus (GET /metrics) e trace amostrado de requisições lentas (0 = desligado)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+    METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 0))
+    METRICS_TRACE_SAMPLE_RATE = float(os.getenv('METRICS_TRACE_SAMPLE_RATE', 0.1))
+
+    # Ranking: com vários workers, ligue para cada processo recarregar do banco nesse intervalo (segundos; 0 = nunca)
+    LEADERBOARD_REFRESH_INTERVAL = int(os.getenv('LEADERBOARD_REFRESH_INTERVAL', 0))
+
+    # Corpos serializados de perfil/conquistas/progresso por (usuário, data_version)
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 1024))
+
+    # Seleção por dificuldade calibrada (calibrate.py): mira a taxa de acerto alvo e deixa
+    # algumas vagas por rodada para o sorteio pelo rótulo, que também alimenta a calibração
+    CALIBRATED_SELECTION = os.getenv('CALIBRATED_SELECTION', '1') == '1'
+    CALIBRATION_TARGET_ACCURACY = float(os.getenv('CALIBRATION_TARGET_ACCURACY', 0.7))
+    CALIBRATION_EXPLORE_SLOTS = int(os.getenv('CALIBRATION_EXPLORE_SLOTS', 1))
+
+    # GET /api/export/activities (Authorization: Bearer <token>); vazio = rota desligada
+    EXPORT_TOKEN = os.getenv('EXPORT_TOKEN', '')
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 5000))
+
+    # Próxima rodada montada em background depois do submit e servida pelo next
+    ROUND_PREFETCH_ENABLED = os.getenv('ROUND_PREFETCH_ENABLED', '1') == '1'
+    ROUND_PREFETCH_WORKERS = int(os.getenv('ROUND_PREFETCH_WORKERS', 2))
+    ROUND_PREFETCH_TTL = int(os.getenv('ROUND_PREFETCH_TTL', 300))
+    ROUND_PREFETCH_WAIT_MS = int(os.getenv('ROUND_PREFETCH_WAIT_MS', 250))
+    ROUND_PREFETCH_MAX_ENTRIES = int(os.getenv('ROUND_PREFETCH_MAX_ENTRIES', 10000))
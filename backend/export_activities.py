@@ -0,0 +1,25 @@
+import argparse
+from datetime import datetime
+
+from app import create_app
+from models import db
+from activity_export import FORMATS, export_to_dir
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta user_activities (com dados da questão) em arquivos comprimidos, de forma incremental.")
+    parser.add_argument('out_dir', help="Diretório dos arquivos e do export_state.json (retomada).")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="csv/jsonl em gzip ou parquet (requer pyarrow).")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Linhas por leitura do cursor server-side.")
+    parser.add_argument('--rows-per-file', type=int, default=1_000_000)
+    parser.add_argument('--since', type=datetime.fromisoformat, help="Primeiro export: só atividades a partir desta data (ISO).")
+    parser.add_argument('--restart', action='store_true', help="Ignora o estado salvo e exporta desde o início.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            summary = export_to_dir(args.out_dir, fmt=args.format, chunk_size=args.chunk_size,
+                                    rows_per_file=args.rows_per_file, since=args.since, restart=args.restart)
+            print(f"✅ Export concluído: {summary}")
+        except Exception as e:
+            print(f"❌ Erro no export: {e}")
+            db.session.rollback()
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AiFeedback
+
+
+class FeedbackCache:
+    """Cache em duas camadas (LRU em memória + tabela ai_feedback) do feedback do tutor IA.
+
+    O texto depende só de (questão, resposta escolhida, acerto), então cada questão tem
+    poucas chaves possíveis. Mudanças no prompt invalidam tudo via FEEDBACK_PROMPT_VERSION.
+    """
+
+    def __init__(self, generate_fn, normalize, max_entries=4096, ttl=0, prompt_version=1):
+        # generate_fn(enunciado, resposta, correta, acertou, prioridade) -> texto ou None
+        self.generate_fn = generate_fn
+        self.normalize = normalize
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prompt_version = prompt_version
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'generation_failures': 0}
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('FEEDBACK_CACHE_MAX_ENTRIES', self.max_entries)
+        self.ttl = app.config.get('FEEDBACK_CACHE_TTL', self.ttl)
+        self.prompt_version = app.config.get('FEEDBACK_PROMPT_VERSION', self.prompt_version)
+
+    def _key(self, question_id, answer, is_correct):
+        answer_hash = hashlib.sha1(self.normalize(answer).encode('utf-8')).hexdigest()
+        return question_id, answer_hash, bool(is_correct), self.prompt_version
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _memory_get(self, key):
+        with self._lock:
+            item = self._lru.get(key)
+            if item is None: return None
+            text, stored_at = item
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return text
+
+    def _memory_put(self, key, text, stored_at=None):
+        with self._lock:
+            self._lru[key] = (text, stored_at or time.time())
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _db_get(self, key):
+        qid, answer_hash, is_correct, version = key
+        q = AiFeedback.query.filter_by(question_id=qid, answer_hash=answer_hash, is_correct=is_correct, prompt_version=version)
+        if self.ttl: q = q.filter(AiFeedback.created_at >= datetime.utcnow() - timedelta(seconds=self.ttl))
+        return q.first()
+
+    def _db_put(self, key, text):
+        qid, answer_hash, is_correct, version = key
+        # Entrada expirada (TTL) é substituída
+        AiFeedback.query.filter_by(question_id=qid, answer_hash=answer_hash, is_correct=is_correct, prompt_version=version).delete()
+        db.session.add(AiFeedback(question_id=qid, answer_hash=answer_hash, is_correct=is_correct, prompt_version=version, feedback=text))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição gravou a mesma chave ao mesmo tempo
+            db.session.rollback()
+
+    def lookup(self, question, answer, is_correct, count=True):
+        """Só consulta o cache (memória e banco); retorna None (e conta um miss) se não houver feedback pronto.
+
+        count=False não mexe nos contadores: para a segunda consulta do mesmo item (ex.: o stream
+        que segue um submit, que já contou o hit ou o miss).
+        """
+        key = self._key(question.id, answer, is_correct)
+        text = self._memory_get(key)
+        if text is not None:
+            if count: self._count('memory_hits')
+            return text
+        row = self._db_get(key)
+        if row:
+            if count: self._count('db_hits')
+            self._memory_put(key, row.feedback, row.created_at.timestamp() if self.ttl else None)
+            return row.feedback
+        if count: self._count('misses')
+        return None
+
+    def get_or_generate(self, question, answer, is_correct, priority='interactive'):
+        """question: qualquer objeto com id, statement e correct_answer (Question ou CatalogEntry)."""
+        text = self.lookup(question, answer, is_correct)
+        if text is not None: return text
+
+        text = self.generate_fn(question.statement, self.normalize(answer), question.correct_answer, is_correct, priority)
+        if not text:
+            self._count('generation_failures')
+            return None
+        self.store(question, answer, is_correct, text)
+        return text
+
+    def store(self, question, answer, is_correct, text):
+        """Grava um feedback já gerado (ex.: ao final de um stream) nas duas camadas."""
+        key = self._key(question.id, answer, is_correct)
+        self._db_put(key, text)
+        self._memory_put(key, text)
+
+    def warm(self, question, priority='refill'):
+        """Pré-gera o feedback de todas as opções de uma questão recém-criada."""
+        correct = self.normalize(question.correct_answer)
+        for option in question.options:
+            self.get_or_generate(question, option, self.normalize(option) == correct, priority)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._lru)
+        lookups = counters['memory_hits'] + counters['db_hits'] + counters['misses']
+        hits = counters['memory_hits'] + counters['db_hits']
+        return {
+            'entries': size, 'max_entries': self.max_entries, 'ttl': self.ttl,
+            'prompt_version': self.prompt_version,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            **counters,
+        }
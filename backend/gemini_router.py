@@ -0,0 +1,315 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from ai_scheduler import Shed
+from metrics import metrics
+
+
+def genai_client_factory(api_key=None, transport=None):
+    """Fábrica de clientes do SDK do Gemini. O SDK (import pesado) só é carregado e
+    configurado quando o primeiro cliente é criado, nunca no import do app."""
+    configured = []
+    def factory(name):
+        import google.generativeai as genai
+        if not configured:
+            genai.configure(api_key=api_key, transport=transport)
+            configured.append(True)
+        return genai.GenerativeModel(name)
+    return factory
+
+def _is_permanent(error):
+    """Erros que não se resolvem sozinhos (modelo inexistente / sem permissão)."""
+    try:
+        from google.api_core import exceptions
+        return isinstance(error, (exceptions.NotFound, exceptions.PermissionDenied))
+    except ImportError:
+        return False
+
+
+class ModelHealth:
+    def __init__(self, name):
+        self.name = name
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=100)
+        self.state = 'closed'  # closed -> open -> half_open -> closed
+        self.opened_at = 0.0
+        self.open_for = 0.0
+        self.last_failure_at = 0.0
+        self.last_error = None
+        self.probing = False  # half_open: já há uma chamada de teste em andamento
+
+    def percentile(self, p):
+        if not self.latencies: return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def to_dict(self):
+        total = self.successes + self.failures
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'state': self.state,
+            'successes': self.successes, 'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures, 'probing': self.probing,
+            'success_rate': round(self.successes / total, 3) if total else None,
+            'latency_p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'latency_p95_ms': round(p95 * 1000) if p95 is not None else None,
+            'last_error': self.last_error,
+        }
+
+
+class ModelRouter:
+    """Roteia chamadas entre os modelos Gemini conforme a saúde de cada um.
+
+    Clientes ficam em cache; cada modelo tem circuit breaker (abre após falhas seguidas e volta
+    em half-open depois de um tempo, com uma única chamada de teste por vez) e prazo por chamada.
+    Opcionalmente dispara uma requisição "hedge" no próximo modelo quando a principal passa do
+    percentil de latência. Com um AiScheduler, cada tentativa (fallback ou hedge) é admitida e
+    cobrada no agendador e ocupa uma vaga de concorrência enquanto roda.
+    """
+
+    def __init__(self, models, client_factory=None, safety_settings=None, scheduler=None, deadline=20.0,
+                 failure_threshold=3, reset_timeout=30.0, hedge=False, hedge_percentile=95, hedge_min_delay=2.0):
+        self.models = list(models)
+        self.client_factory = client_factory
+        self.safety_settings = safety_settings
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+
+        self._clients = {}
+        self._health = {m: ModelHealth(m) for m in self.models}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gemini-hedge')
+        self._preloading = None
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def init_app(self, app):
+        c = app.config
+        self.models = c.get('GEMINI_MODELS', self.models)
+        self._health = {m: self._health.get(m) or ModelHealth(m) for m in self.models}
+        self.deadline = c.get('GEMINI_DEADLINE', self.deadline)
+        self.failure_threshold = c.get('GEMINI_BREAKER_FAILURES', self.failure_threshold)
+        self.reset_timeout = c.get('GEMINI_BREAKER_RESET', self.reset_timeout)
+        self.hedge = c.get('GEMINI_HEDGE', self.hedge)
+        self.hedge_percentile = c.get('GEMINI_HEDGE_PERCENTILE', self.hedge_percentile)
+        self.hedge_min_delay = c.get('GEMINI_HEDGE_MIN_DELAY', self.hedge_min_delay)
+        if self.client_factory is None:
+            self.client_factory = genai_client_factory(c.get('GOOGLE_API_KEY'), c.get('GEMINI_TRANSPORT'))
+
+    def preload(self):
+        """Cria o cliente do modelo preferido em background, para a primeira chamada não pagar o import do SDK."""
+        if self._preloading is not None or not self.models: return
+        with self._lock:
+            if self._preloading is not None: return
+            self._preloading = threading.Thread(target=self._preload, name='gemini-preload', daemon=True)
+        self._preloading.start()
+
+    def _preload(self):
+        try:
+            self._client(self.models[0])
+        except Exception as e:
+            print(f"   ⚠️ Erro ao pré-carregar o cliente Gemini: {e}")
+
+    def _client(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            if self.client_factory is None: self.client_factory = genai_client_factory()
+            client = self._clients[name] = self.client_factory(name)
+        return client
+
+    def _available(self):
+        """Modelos que podem receber chamadas agora, os saudáveis primeiro (mantendo a ordem configurada).
+
+        Um modelo que falhou recentemente vai para o fim da fila até reset_timeout passar.
+        Em half_open, o modelo só aparece enquanto ninguém está testando (ver _claim).
+        """
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for i, m in enumerate(self.models):
+                h = self._health[m]
+                if h.state == 'open' and now - h.opened_at < h.open_for: continue
+                if h.state == 'half_open' and h.probing: continue
+                degraded = h.consecutive_failures > 0 and now - h.last_failure_at < self.reset_timeout
+                out.append((degraded, i, m))
+        return [m for _, _, m in sorted(out)]
+
+    def _claim(self, name):
+        """Reserva uma chamada ao modelo. Circuito aberto já vencido vira half_open e só o
+        primeiro a chegar faz a chamada de teste; os demais recebem False até ela terminar."""
+        with self._lock:
+            h = self._health[name]
+            if h.state == 'open':
+                if time.monotonic() - h.opened_at < h.open_for: return False
+                h.state = 'half_open'
+            if h.state == 'half_open':
+                if h.probing: return False
+                h.probing = True
+            return True
+
+    def _release(self, name):
+        """Libera a reserva de _claim quando a chamada termina sem resultado (ex.: stream abandonado)."""
+        with self._lock:
+            self._health[name].probing = False
+
+    def _estimate(self, prompt):
+        return self.scheduler.estimate_tokens(prompt) if self.scheduler else 0
+
+    def _acquire(self, name, priority, tokens, wait=True):
+        """Vaga no agendador para uma tentativa já reservada com _claim (desfaz a reserva se não houver)."""
+        if self.scheduler is None: return True
+        ok = self.scheduler.acquire(priority, tokens) if wait else self.scheduler.try_acquire(priority, tokens)
+        if not ok: self._release(name)
+        return ok
+
+    def _record(self, name, elapsed=None, error=None):
+        with self._lock:
+            h = self._health[name]
+            h.probing = False
+            if error is None:
+                h.successes += 1
+                h.consecutive_failures = 0
+                h.latencies.append(elapsed)
+                h.state = 'closed'
+                return
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.last_failure_at = time.monotonic()
+            h.last_error = f"{type(error).__name__}: {error}"[:200]
+            permanent = _is_permanent(error)
+            if permanent or h.state == 'half_open' or h.consecutive_failures >= self.failure_threshold:
+                h.state = 'open'
+                h.opened_at = time.monotonic()
+                # Modelo inexistente/sem permissão fica fora por mais tempo
+                h.open_for = self.reset_timeout * (10 if permanent else 1)
+
+    def _attempt(self, name, prompt):
+        """Uma chamada ao modelo; libera a vaga do agendador (admitida antes) ao terminar."""
+        start = time.perf_counter()
+        try:
+            kwargs = {'request_options': {'timeout': self.deadline}}
+            if self.safety_settings: kwargs['safety_settings'] = self.safety_settings
+            response = self._client(name).generate_content(prompt, **kwargs)
+            text = response.text
+            if not text: raise ValueError("Resposta vazia")
+        except Exception as e:
+            self._record(name, error=e)
+            metrics.observe(metrics.gemini, time.perf_counter() - start, model=name, mode='generate', outcome='error')
+            raise
+        finally:
+            if self.scheduler: self.scheduler.release()
+        elapsed = time.perf_counter() - start
+        self._record(name, elapsed=elapsed)
+        metrics.observe(metrics.gemini, elapsed, model=name, mode='generate', outcome='ok')
+        return text
+
+    def _hedge_delay(self, name):
+        with self._lock:
+            h = self._health[name]
+            p = h.percentile(self.hedge_percentile) if len(h.latencies) >= 10 else None
+        return max(self.hedge_min_delay, p or 0)
+
+    def _hedged(self, primary, secondary, prompt, tried, priority, tokens):
+        """Dispara o principal; se passar do percentil de latência, dispara também o secundário.
+
+        O principal já vem reservado e admitido; o secundário só dispara se houver vaga no
+        agendador na hora (o hedge nunca espera na fila).
+        """
+        first = self._executor.submit(self._attempt, primary, prompt)
+        done, _ = wait([first], timeout=self._hedge_delay(primary))
+        if done: return first.result()
+
+        tried.add(secondary)
+        if not self._claim(secondary) or not self._acquire(secondary, priority, tokens, wait=False):
+            # Secundário indisponível (já testado por outro pedido em half_open, ou sem vaga): só espera o principal
+            return first.result(timeout=self.deadline)
+        with self._lock:
+            self.hedges_fired += 1
+        second = self._executor.submit(self._attempt, secondary, prompt)
+        pending, error = {first, second}, None
+        deadline = time.monotonic() + self.deadline
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done: break
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return f.result()
+                error = f.exception()
+        raise error or TimeoutError("Prazo esgotado na chamada hedge")
+
+    def generate(self, prompt, priority='interactive'):
+        """Retorna o texto do primeiro modelo que responder, ou None se todos falharem ou o agendador descartar."""
+        candidates = self._available()
+        tokens = self._estimate(prompt)
+        tried = set()
+        for m in candidates:
+            if m in tried: continue
+            tried.add(m)
+            if not self._claim(m): continue
+            if not self._acquire(m, priority, tokens):
+                print(f"⏳ Chamada de IA ({priority}) descartada: orçamento esgotado.")
+                return None
+            rest = [c for c in candidates if c not in tried]
+            try:
+                if self.hedge and rest: return self._hedged(m, rest[0], prompt, tried, priority, tokens)
+                return self._attempt(m, prompt)
+            except Exception as e:
+                print(f"   ⚠️ Erro no modelo {m}: {e}")
+        if not candidates: print("   ⛔ Todos os modelos Gemini estão com o circuito aberto.")
+        return None
+
+    def generate_stream(self, prompt, priority='interactive'):
+        """Gera o texto em pedaços (API de streaming). Só troca de modelo antes do primeiro pedaço.
+
+        Levanta Shed se o agendador descartar uma tentativa.
+        """
+        tokens = self._estimate(prompt)
+        for m in self._available():
+            if not self._claim(m): continue
+            if not self._acquire(m, priority, tokens): raise Shed(f"Chamada de IA ({priority}) descartada: orçamento esgotado.")
+            start = time.perf_counter()
+            started = False
+            try:
+                kwargs = {'stream': True, 'request_options': {'timeout': self.deadline}}
+                if self.safety_settings: kwargs['safety_settings'] = self.safety_settings
+                for chunk in self._client(m).generate_content(prompt, **kwargs):
+                    text = getattr(chunk, 'text', '')
+                    if not text: continue
+                    started = True
+                    yield text
+                if not started: raise ValueError("Resposta vazia")
+            except GeneratorExit:
+                self._release(m)
+                raise
+            except Exception as e:
+                self._record(m, error=e)
+                metrics.observe(metrics.gemini, time.perf_counter() - start, model=m, mode='stream', outcome='error')
+                print(f"   ⚠️ Erro no modelo {m} (stream): {e}")
+                if started: raise
+                continue
+            finally:
+                if self.scheduler: self.scheduler.release()
+            elapsed = time.perf_counter() - start
+            self._record(m, elapsed=elapsed)
+            metrics.observe(metrics.gemini, elapsed, model=m, mode='stream', outcome='ok')
+            return
+
+    def state(self):
+        with self._lock:
+            models = {m: self._health[m].to_dict() for m in self.models}
+        return {
+            'models': models, 'deadline_s': self.deadline, 'hedge': self.hedge,
+            'hedges_fired': self.hedges_fired, 'hedges_won': self.hedges_won,
+        }
@@ -0,0 +1,216 @@
+import argparse
+import csv
+import gzip
+import json
+import random
+import sys
+import time
+import unicodedata
+
+from app import create_app, clean_option_text, DIFFICULTIES
+from models import db, Question, question_fingerprint
+
+# Rótulos aceitos no arquivo para cada dificuldade do banco
+DIFFICULTY_ALIASES = {
+    'facil': 'fácil', 'easy': 'fácil', 'iniciante': 'fácil',
+    'medio': 'médio', 'medium': 'médio', 'intermediario': 'médio',
+    'dificil': 'difícil', 'hard': 'difícil', 'avancado': 'difícil',
+}
+OPTION_COLUMNS = [f'option_{c}' for c in 'abcdef']
+LETTERS = 'ABCDEF'
+# Limites das colunas String(n) de questions: valor maior derrubaria o INSERT do lote inteiro no Postgres
+MAX_LENGTHS = {c.name: c.type.length for c in Question.__table__.columns if getattr(c.type, 'length', None)}
+
+
+class Rejected(ValueError):
+    def __init__(self, reason, raw=None):
+        super().__init__(reason)
+        self.raw = raw
+
+
+def _open(path):
+    if path == '-': return sys.stdin
+    if path.endswith('.gz'): return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+def read_rows(path, fmt=None):
+    """Gera (nº da linha, dict) do arquivo JSONL ou CSV, sem carregá-lo inteiro.
+
+    Linhas JSON ilegíveis saem como Rejected (com o texto original) em vez de abortar.
+    """
+    fmt = fmt or ('csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl')
+    with _open(path) as f:
+        if fmt == 'csv':
+            for n, row in enumerate(csv.DictReader(f), start=2):
+                yield n, row
+            return
+        for n, line in enumerate(f, start=1):
+            if not line.strip(): continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = Rejected(f"JSON inválido: {e.msg}", line.rstrip('\n'))
+            yield n, row
+
+
+def _options(row):
+    opts = row.get('options')
+    # Célula vazia no CSV: usa as colunas option_a..option_f
+    if isinstance(opts, str) and not opts.strip(): opts = None
+    if isinstance(opts, str):
+        text = opts.strip()
+        if text.startswith('['):
+            try:
+                opts = json.loads(text)
+            except json.JSONDecodeError:
+                raise Rejected("options não é uma lista JSON válida")
+        else:
+            opts = text.split('|')
+    if opts is None: opts = [row[c] for c in OPTION_COLUMNS if row.get(c)]
+    if not isinstance(opts, list): raise Rejected("options deve ser uma lista")
+    return [clean_option_text(str(o)) for o in opts]
+
+def _difficulty(value):
+    label = str(value or '').strip().lower()
+    if label in DIFFICULTIES: return label
+    plain = unicodedata.normalize('NFKD', label).encode('ascii', 'ignore').decode()
+    if plain in DIFFICULTY_ALIASES: return DIFFICULTY_ALIASES[plain]
+    raise Rejected(f"dificuldade desconhecida: {value!r}")
+
+def normalize(row, default_difficulty=None, default_topic=None):
+    """Valida e normaliza uma linha do arquivo no dict de insert de Question. Levanta Rejected."""
+    if not isinstance(row, dict): raise Rejected("linha não é um objeto")
+    statement = str(row.get('statement') or row.get('question') or '').strip()
+    if not statement: raise Rejected("enunciado vazio")
+
+    opts = _options(row)
+    if len(opts) < 2: raise Rejected("menos de 2 opções")
+    if not all(opts): raise Rejected("opção vazia")
+    if len({o.casefold() for o in opts}) != len(opts): raise Rejected("opções repetidas")
+
+    correct = clean_option_text(str(row.get('correct_answer') or ''))
+    if correct not in opts and len(correct) == 1 and correct.upper() in LETTERS[:len(opts)]:
+        # Gabarito dado pela letra da opção
+        correct = opts[LETTERS.index(correct.upper())]
+    if not correct: raise Rejected("sem correct_answer")
+    if correct not in opts: raise Rejected("correct_answer não está entre as opções")
+
+    item = {
+        'statement': statement, 'options': opts, 'correct_answer': correct,
+        'difficulty': _difficulty(row.get('difficulty') or default_difficulty),
+        'topic': (str(row.get('topic') or '').strip() or default_topic or None),
+        'random_key': random.random(), 'fingerprint': question_fingerprint(statement, opts),
+    }
+    for column, limit in MAX_LENGTHS.items():
+        value = item.get(column)
+        if isinstance(value, str) and len(value) > limit:
+            raise Rejected(f"{column} com mais de {limit} caracteres")
+    return item
+
+
+def backfill_fingerprints(batch_size=5000):
+    """Preenche fingerprint das questões criadas antes da coluna existir."""
+    total = 0
+    while True:
+        rows = db.session.query(Question.id, Question.statement, Question.options) \
+            .filter(Question.fingerprint.is_(None)).limit(batch_size).all()
+        if not rows: break
+        db.session.execute(db.update(Question), [
+            {'id': i, 'fingerprint': question_fingerprint(s, o)} for i, s, o in rows
+        ])
+        db.session.commit()
+        total += len(rows)
+    return total
+
+
+class Importer:
+    """Carrega questões em lotes: dedup no próprio arquivo e contra o banco, rejeitos em JSONL."""
+
+    def __init__(self, batch_size=2000, reject_file=None, dry_run=False, progress_every=10000):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress_every = progress_every
+        self.rejects = reject_file
+        self.batch = []
+        self.seen = set()  # digests (16 bytes) já vistos nesta execução
+        self.counts = {'read': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        self.start = time.perf_counter()
+
+    def reject(self, line, reason, raw):
+        self.counts['rejected'] += 1
+        if self.rejects:
+            self.rejects.write(json.dumps({'line': line, 'reason': reason, 'row': raw}, ensure_ascii=False, default=str) + '\n')
+
+    def add(self, line, raw, default_difficulty=None, default_topic=None):
+        self.counts['read'] += 1
+        try:
+            if isinstance(raw, Rejected): raise raw
+            item = normalize(raw, default_difficulty, default_topic)
+        except Rejected as e:
+            self.reject(line, str(e), e.raw if e.raw is not None else raw)
+            return
+        key = bytes.fromhex(item['fingerprint'][:32])
+        if key in self.seen:
+            self.counts['duplicates'] += 1
+            return
+        self.seen.add(key)
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size: self.flush()
+        if self.counts['read'] % self.progress_every == 0: self.report()
+
+    def flush(self):
+        if not self.batch: return
+        fps = [q['fingerprint'] for q in self.batch]
+        existing = {fp for (fp,) in db.session.query(Question.fingerprint).filter(Question.fingerprint.in_(fps))}
+        rows = [q for q in self.batch if q['fingerprint'] not in existing]
+        self.counts['duplicates'] += len(self.batch) - len(rows)
+        self.batch = []
+        if not rows: return
+        if not self.dry_run:
+            db.session.execute(db.insert(Question), rows)
+            db.session.commit()
+        self.counts['inserted'] += len(rows)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        c = self.counts
+        print(f"   📥 {c['read']} lidas | {c['inserted']} inseridas | {c['duplicates']} duplicadas | "
+              f"{c['rejected']} rejeitadas | {c['read'] / elapsed if elapsed else 0:.0f} linhas/s")
+
+
+def import_file(path, fmt=None, batch_size=2000, reject_path=None, dry_run=False,
+                default_difficulty=None, default_topic=None, progress_every=10000):
+    if not dry_run:
+        filled = backfill_fingerprints()
+        if filled: print(f"🔑 fingerprint preenchida em {filled} questões antigas.")
+    rejects = open(reject_path, 'w', encoding='utf-8') if reject_path else None
+    try:
+        importer = Importer(batch_size, rejects, dry_run, progress_every)
+        for line, row in read_rows(path, fmt):
+            importer.add(line, row, default_difficulty, default_topic)
+        importer.flush()
+        importer.report()
+        return importer.counts
+    finally:
+        if rejects: rejects.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Importa um banco de questões (JSONL ou CSV, opcionalmente .gz) em lotes.")
+    parser.add_argument('path', help="Arquivo de entrada ('-' = stdin, JSONL).")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="Padrão: pela extensão do arquivo.")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Questões por insert/commit.")
+    parser.add_argument('--rejects', help="Arquivo JSONL com as linhas rejeitadas e o motivo.")
+    parser.add_argument('--difficulty', help="Dificuldade para linhas sem a coluna.")
+    parser.add_argument('--topic', help="Tópico para linhas sem a coluna.")
+    parser.add_argument('--dry-run', action='store_true', help="Só valida e conta, sem gravar.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            counts = import_file(args.path, args.format, args.batch_size, args.rejects, args.dry_run,
+                                 args.difficulty, args.topic)
+            print(f"✅ Import concluído: {counts}")
+        except Exception as e:
+            print(f"❌ Erro no import: {e}")
+            db.session.rollback()
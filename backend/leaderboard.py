@@ -0,0 +1,221 @@
+import bisect
+import threading
+import time
+
+from models import db, User
+
+
+class FenwickTree:
+    """Árvore de Fenwick (BIT) sobre contagens por índice: soma de prefixo e busca em O(log n)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    @classmethod
+    def from_counts(cls, counts):
+        """Monta a árvore em O(n) a partir de {índice: contagem}."""
+        size = 1
+        while size <= max(counts, default=0): size *= 2
+        t = cls(size)
+        for i, c in counts.items(): t.tree[i + 1] += c
+        for i in range(1, size + 1):
+            j = i + (i & -i)
+            if j <= size: t.tree[j] += t.tree[i]
+        return t
+
+    def add(self, i, delta):
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Soma das contagens nos índices 0..i."""
+        i, s = min(i, self.size - 1) + 1, 0
+        while i > 0:
+            s += self.tree[i]
+            i -= i & -i
+        return s
+
+    def lower_bound(self, target):
+        """Menor índice cujo prefixo acumulado é >= target (target >= 1)."""
+        pos, step = 0, 1 << (self.size.bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class Board:
+    """Um ranking: Fenwick por pontuação + ids ordenados dentro de cada pontuação.
+
+    Ordem: pontuação decrescente; empate pelo id (quem chegou antes fica na frente).
+    """
+
+    def __init__(self, members=()):
+        self.buckets = {}
+        for uid, score in members:
+            self.buckets.setdefault(score, []).append(uid)
+        for ids in self.buckets.values(): ids.sort()
+        self.tree = FenwickTree.from_counts({s: len(ids) for s, ids in self.buckets.items()})
+        self.total = sum(len(ids) for ids in self.buckets.values())
+
+    def _fit(self, score):
+        if score >= self.tree.size:
+            self.tree = FenwickTree.from_counts({s: len(ids) for s, ids in self.buckets.items() if ids} | {score: 0})
+
+    def add(self, uid, score):
+        self._fit(score)
+        bisect.insort(self.buckets.setdefault(score, []), uid)
+        self.tree.add(score, 1)
+        self.total += 1
+
+    def remove(self, uid, score):
+        ids = self.buckets.get(score)
+        i = bisect.bisect_left(ids, uid) if ids else 0
+        if not ids or i == len(ids) or ids[i] != uid: return
+        ids.pop(i)
+        if not ids: del self.buckets[score]
+        self.tree.add(score, -1)
+        self.total -= 1
+
+    def rank(self, uid, score):
+        above = self.total - self.tree.prefix(score)
+        return above + bisect.bisect_left(self.buckets[score], uid) + 1
+
+    def at(self, rank):
+        """(user_id, pontuação) na posição `rank` (1 = primeiro)."""
+        score = self.tree.lower_bound(self.total - rank + 1)
+        above = self.total - self.tree.prefix(score)
+        return self.buckets[score][rank - above - 1], score
+
+    def slice(self, first, last):
+        first, last = max(1, first), min(self.total, last)
+        return [(r, *self.at(r)) for r in range(first, last + 1)]
+
+
+class Leaderboard:
+    """Rankings global e por nível, em memória e mantidos incrementalmente.
+
+    Carregado do banco no primeiro uso; o submit chama update() depois do commit, no mesmo
+    caminho que muda u.score. Rank, top-N e vizinhos custam O(log n) por posição.
+    Com vários processos, cada um só vê os próprios submits: LEADERBOARD_REFRESH_INTERVAL > 0
+    (desligado por padrão) recarrega do banco em background nesse intervalo. A recarga monta
+    os rankings novos fora do lock e troca de uma vez.
+    """
+
+    GLOBAL = 'global'
+
+    def __init__(self, levels):
+        self.levels = list(levels)
+        self.app = None
+        self.refresh_interval = 0
+        self._boards = None
+        self._members = {}
+        self._pending = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self.rebuilds = 0
+        self.last_rebuild_s = None
+
+    def init_app(self, app):
+        self.app = app
+        self.refresh_interval = app.config.get('LEADERBOARD_REFRESH_INTERVAL', self.refresh_interval)
+
+    def rebuild(self, chunk_size=10000):
+        """Recarrega todos os rankings a partir de users (id, score, level)."""
+        start = time.perf_counter()
+        with self._lock:
+            self._pending = {}
+        members = {}
+        for uid, score, level in db.session.query(User.id, User.score, User.level).yield_per(chunk_size):
+            members[uid] = (max(score or 0, 0), level)
+
+        with self._lock:
+            seen = dict(self._pending)
+        # Submits que chegaram durante a leitura: a pontuação só cresce, então vale a maior
+        for uid, (score, level) in seen.items():
+            if uid not in members or score >= members[uid][0]: members[uid] = (score, level)
+        # Monta os rankings fora do lock: leituras e submits seguem usando os atuais
+        boards = {self.GLOBAL: Board((uid, s) for uid, (s, _) in members.items())}
+        for lvl in self.levels:
+            boards[lvl] = Board((uid, s) for uid, (s, l) in members.items() if l == lvl)
+
+        with self._lock:
+            # Só os submits que chegaram durante a montagem são reaplicados com o lock
+            for uid, member in self._pending.items():
+                if seen.get(uid) != member: self._apply(boards, members, uid, *member)
+            self._pending = None
+            self._boards, self._members = boards, members
+            self.rebuilds += 1
+            self.last_rebuild_s = round(time.perf_counter() - start, 3)
+        return len(members)
+
+    def _ensure_loaded(self):
+        if self._boards is not None: return
+        with self._load_lock:
+            if self._boards is not None: return
+            self.rebuild()
+            if self.refresh_interval and self.app is not None and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='leaderboard-refresh', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                with self.app.app_context():
+                    self.rebuild()
+            except Exception as e:
+                print(f"⚠️ Erro ao recarregar o ranking: {e}")
+
+    def update(self, uid, score, level):
+        """Aplica a nova pontuação/nível do usuário (chamar depois do commit)."""
+        score = max(score or 0, 0)
+        with self._lock:
+            if self._pending is not None: self._pending[uid] = (score, level)
+            if self._boards is None: return
+            self._apply(self._boards, self._members, uid, score, level)
+
+    def _apply(self, boards, members, uid, score, level):
+        """Move o usuário para (score, level) nos rankings dados (chamar com self._lock)."""
+        old = members.get(uid)
+        if old == (score, level): return
+        if old:
+            boards[self.GLOBAL].remove(uid, old[0])
+            if old[1] in boards: boards[old[1]].remove(uid, old[0])
+        boards[self.GLOBAL].add(uid, score)
+        if level in boards: boards[level].add(uid, score)
+        members[uid] = (score, level)
+
+    def _board(self, level):
+        board = self._boards.get(level or self.GLOBAL)
+        if board is None: raise KeyError(level)
+        return board
+
+    def top(self, n, level=None):
+        """[(rank, user_id, score)] dos n primeiros."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._board(level).slice(1, n)
+
+    def around(self, uid, k, level=None):
+        """(rank, total, [(rank, user_id, score)] de rank-k a rank+k) ou None se o usuário não está no ranking."""
+        self._ensure_loaded()
+        with self._lock:
+            board = self._board(level)
+            member = self._members.get(uid)
+            if member is None or (level and member[1] != level): return None
+            rank = board.rank(uid, member[0])
+            return rank, board.total, board.slice(rank - k, rank + k)
+
+    def stats(self):
+        with self._lock:
+            boards = {name: b.total for name, b in (self._boards or {}).items()}
+        return {'loaded': self._boards is not None, 'boards': boards, 'rebuilds': self.rebuilds,
+                'last_rebuild_s': self.last_rebuild_s, 'refresh_interval': self.refresh_interval}
@@ -0,0 +1,196 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Limites (segundos) dos buckets dos histogramas
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n=1, **labels):
+        key = tuple(labels.get(l, '') for l in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self):
+        with self._lock:
+            return [f'{self.name}{_labels(self.labelnames, k)} {v}' for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [contagem por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels.get(l, '') for l in self.labelnames)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None: s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if seconds <= le: s[i] += 1
+            s[-2] += seconds
+            s[-1] += 1
+
+    def render(self):
+        out = []
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                for le, n in zip(self.buckets, s):
+                    out.append(f'{self.name}_bucket{_labels(self.labelnames, key, ("le", le))} {n}')
+                out.append(f'{self.name}_bucket{_labels(self.labelnames, key, ("le", "+Inf"))} {s[-1]}')
+                out.append(f'{self.name}_sum{_labels(self.labelnames, key)} {round(s[-2], 6)}')
+                out.append(f'{self.name}_count{_labels(self.labelnames, key)} {s[-1]}')
+        return out
+
+
+class Metrics:
+    """Métricas do processo no formato texto do Prometheus (GET /metrics).
+
+    Middleware de tempo por requisição, tempo de cada query (eventos do SQLAlchemy) e
+    timers de etapa (Gemini por modelo, chamada de IA completa, inserts no MongoDB, pandas).
+    Com METRICS_SLOW_REQUEST_MS > 0, uma amostra das requisições guarda as etapas e as
+    que passarem do limite são impressas como trace (uma linha JSON).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_request_ms = 0
+        self.trace_sample_rate = 0.1
+        self.max_trace_spans = 200
+        self._listening = False
+
+        self.http = Histogram('upwise_http_request_duration_seconds', 'Tempo de resposta por rota', ('endpoint', 'method'))
+        self.http_total = Counter('upwise_http_requests_total', 'Requisições por rota e status', ('endpoint', 'method', 'status'))
+        self.db = Histogram('upwise_db_query_duration_seconds', 'Tempo de cada query SQL', ('operation',))
+        self.gemini = Histogram('upwise_gemini_call_duration_seconds', 'Tentativas por modelo Gemini (inclui fallbacks e hedges)', ('model', 'mode', 'outcome'))
+        self.ai_call = Histogram('upwise_ai_call_duration_seconds', 'call_gemini completo (fila do agendador + fallbacks)', ('priority', 'outcome'))
+        self.mongo = Histogram('upwise_mongo_insert_duration_seconds', 'insert_many dos logs de atividade', ('outcome',))
+        self.stages = Histogram('upwise_stage_duration_seconds', 'Outras etapas instrumentadas', ('stage',))
+        self.slow_total = Counter('upwise_slow_requests_total', 'Requisições acima de METRICS_SLOW_REQUEST_MS', ('endpoint',))
+        self.round_prefetch = Counter('upwise_round_prefetch_total', 'next servido pela rodada pré-montada (hit) ou não', ('outcome',))
+        self.round_prefetch_saved = Histogram('upwise_round_prefetch_saved_seconds', 'Tempo de montagem poupado no next por hit')
+        self._registry = [self.http, self.http_total, self.db, self.gemini, self.ai_call, self.mongo, self.stages, self.slow_total,
+                          self.round_prefetch, self.round_prefetch_saved]
+
+    def init_app(self, app):
+        c = app.config
+        self.enabled = c.get('METRICS_ENABLED', self.enabled)
+        self.slow_request_ms = c.get('METRICS_SLOW_REQUEST_MS', self.slow_request_ms)
+        self.trace_sample_rate = c.get('METRICS_TRACE_SAMPLE_RATE', self.trace_sample_rate)
+        if not self.enabled: return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor)
+            event.listen(Engine, 'handle_error', self._cursor_error)
+            self._listening = True
+
+    # --- Registro ---
+
+    def observe(self, histogram, seconds, **labels):
+        """Registra no histograma e, se a requisição atual estiver amostrada, no trace dela."""
+        if not self.enabled: return
+        histogram.observe(seconds, **labels)
+        if not has_request_context(): return
+        trace = g.get('metrics_trace')
+        if trace is not None and len(trace) < self.max_trace_spans:
+            end = time.perf_counter()
+            trace.append({
+                'span': histogram.name.replace('upwise_', '').replace('_duration_seconds', ''), **labels,
+                'start_ms': round((end - seconds - g.metrics_start) * 1000, 2), 'ms': round(seconds * 1000, 2),
+            })
+
+    @contextmanager
+    def timer(self, histogram, **labels):
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            if 'outcome' in histogram.labelnames: labels['outcome'] = outcome
+            self.observe(histogram, time.perf_counter() - start, **labels)
+
+    def stage(self, name):
+        return self.timer(self.stages, stage=name)
+
+    # --- Middleware de requisição ---
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        sampled = self.slow_request_ms > 0 and random.random() < self.trace_sample_rate
+        g.metrics_trace = [] if sampled else None
+
+    def _after_request(self, response):
+        start = g.get('metrics_start')
+        if start is None: return response
+        # Em respostas em stream (SSE) mede até os cabeçalhos; o modelo aparece em upwise_gemini_*
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.http.observe(elapsed, endpoint=endpoint, method=request.method)
+        self.http_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self.slow_total.inc(endpoint=endpoint)
+            trace = g.get('metrics_trace')
+            if trace is not None:
+                print("🐢 Requisição lenta: " + json.dumps({
+                    'method': request.method, 'path': request.path, 'status': response.status_code,
+                    'ms': round(elapsed * 1000, 2), 'spans': trace,
+                }, ensure_ascii=False, default=str))
+        return response
+
+    # --- Queries (eventos do SQLAlchemy) ---
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('metrics_query_start')
+        if not stack: return
+        elapsed = time.perf_counter() - stack.pop()
+        self.observe(self.db, elapsed, operation=(statement.lstrip().split(None, 1) or ['?'])[0].upper())
+
+    def _cursor_error(self, context):
+        stack = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+        if stack: stack.pop()
+
+    # --- Exportação ---
+
+    def render(self):
+        lines = []
+        for m in self._registry:
+            lines += [f'# HELP {m.name} {m.help}', f'# TYPE {m.name} {m.kind}'] + m.render()
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
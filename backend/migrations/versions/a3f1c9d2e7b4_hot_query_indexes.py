@@ -0,0 +1,129 @@
+"""Esquema das melhorias do backend + índices compostos para as consultas quentes
+
+Revision ID: a3f1c9d2e7b4
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+Esquema base: tabelas criadas por db.create_all() na versão original (users, questions,
+user_activities, achievements). Primeiro traz esse esquema até o atual: colunas
+users.correct_answers e users.badges_mask, questions.random_key e as tabelas user_stats,
+user_progress_daily, submit_receipts e ai_feedback. Depois de migrar um banco antigo, rode
+rebuild_stats.py (preenche contadores, rollups e random_key a partir do histórico).
+
+Cada índice casa com uma consulta:
+
+- questions (difficulty, random_key) / (difficulty, topic, random_key): sorteio em
+  question_sampler._scan (filtro + ORDER BY random_key LIMIT n) e contagem do reabastecedor
+- user_activities (user_id, question_id): "já vistas" do sample_unseen_questions (index-only)
+- achievements (user_id, title): GET /api/user/achievements e sincronização do badges_mask
+
+Usuários por email, user_stats, user_progress_daily, submit_receipts e ai_feedback já são
+atendidos pelos índices das constraints UNIQUE. No Postgres os índices são criados com
+CONCURRENTLY (sem travar escritas em user_activities). Idempotente: bancos criados pelo
+create_all atual já têm essas colunas, tabelas e índices.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_questions_difficulty_random_key', 'questions', ['difficulty', 'random_key']),
+    ('ix_questions_difficulty_topic_random_key', 'questions', ['difficulty', 'topic', 'random_key']),
+    ('ix_user_activities_user_question', 'user_activities', ['user_id', 'question_id']),
+    ('ix_achievements_user_id_title', 'achievements', ['user_id', 'title']),
+]
+
+
+COLUMNS = [
+    ('users', sa.Column('correct_answers', sa.Integer(), nullable=True, server_default='0')),
+    ('users', sa.Column('badges_mask', sa.BigInteger(), nullable=True)),
+    ('questions', sa.Column('random_key', sa.Float(), nullable=True)),
+]
+
+
+def _create_tables(tables):
+    if 'user_stats' not in tables:
+        op.create_table(
+            'user_stats',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('dimension', sa.String(20), nullable=False),
+            sa.Column('key', sa.String(100), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('correct', sa.Integer(), nullable=False, server_default='0'),
+            sa.UniqueConstraint('user_id', 'dimension', 'key', name='uq_user_stats_user_dimension_key'),
+        )
+    if 'user_progress_daily' not in tables:
+        op.create_table(
+            'user_progress_daily',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('topic', sa.String(100), nullable=False, server_default=''),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('correct', sa.Integer(), nullable=False, server_default='0'),
+            sa.UniqueConstraint('user_id', 'day', 'topic', name='uq_user_progress_daily_user_day_topic'),
+        )
+    if 'submit_receipts' not in tables:
+        op.create_table(
+            'submit_receipts',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('idempotency_key', sa.String(64), nullable=False),
+            sa.Column('response', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_submit_receipts_user_key'),
+        )
+    if 'ai_feedback' not in tables:
+        op.create_table(
+            'ai_feedback',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('question_id', sa.Integer(), sa.ForeignKey('questions.id'), nullable=False),
+            sa.Column('answer_hash', sa.String(40), nullable=False),
+            sa.Column('is_correct', sa.Boolean(), nullable=False),
+            sa.Column('prompt_version', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('feedback', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('question_id', 'answer_hash', 'is_correct', 'prompt_version', name='uq_ai_feedback_key'),
+        )
+
+
+def _create_indexes(tables):
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for name, table, columns in INDEXES:
+        if table not in tables: continue
+        op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=postgres)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    # Bancos do esquema original: colunas novas (preencha com rebuild_stats.py) e tabelas novas
+    for table, column in COLUMNS:
+        if table in tables and column.name not in {c['name'] for c in inspector.get_columns(table)}:
+            op.add_column(table, column)
+    _create_tables(tables)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY não roda dentro de transação
+        with op.get_context().autocommit_block():
+            _create_indexes(tables)
+    else:
+        _create_indexes(tables)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    for table in ('ai_feedback', 'submit_receipts', 'user_progress_daily', 'user_stats'):
+        op.drop_table(table)
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(column.name)
@@ -0,0 +1,32 @@
+"""Versão dos dados do usuário (ETag / Last-Modified)
+
+Revision ID: b7c2d4e8f1a9
+Revises: a3f1c9d2e7b4
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2d4e8f1a9'
+down_revision = 'a3f1c9d2e7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'users' not in inspector.get_table_names(): return
+    columns = {c['name'] for c in inspector.get_columns('users')}
+    if 'data_version' not in columns:
+        op.add_column('users', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+    if 'data_updated_at' not in columns:
+        op.add_column('users', sa.Column('data_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_updated_at')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,54 @@
+"""Calibração de dificuldade/habilidade (IRT/Elo)
+
+Revision ID: c4d9e2f7a1b3
+Revises: b7c2d4e8f1a9
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d9e2f7a1b3'
+down_revision = 'b7c2d4e8f1a9'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('questions', sa.Column('calibrated_difficulty', sa.Float(), nullable=True)),
+    ('questions', sa.Column('calibration_count', sa.Integer(), nullable=False, server_default='0')),
+    ('users', sa.Column('ability', sa.Float(), nullable=True)),
+    ('users', sa.Column('ability_count', sa.Integer(), nullable=False, server_default='0')),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, column in COLUMNS:
+        if table in tables and column.name not in {c['name'] for c in inspector.get_columns(table)}:
+            op.add_column(table, column)
+
+    if 'questions' in tables:
+        op.create_index('ix_questions_calibrated_difficulty', 'questions', ['calibrated_difficulty'], if_not_exists=True)
+        op.create_index('ix_questions_topic_calibrated_difficulty', 'questions', ['topic', 'calibrated_difficulty'], if_not_exists=True)
+
+    if 'calibration_checkpoints' not in tables:
+        op.create_table(
+            'calibration_checkpoints',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(50), nullable=False, unique=True),
+            sa.Column('last_activity_id', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('answers_processed', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table('calibration_checkpoints')
+    op.drop_index('ix_questions_topic_calibrated_difficulty', table_name='questions', if_exists=True)
+    op.drop_index('ix_questions_calibrated_difficulty', table_name='questions', if_exists=True)
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(column.name)
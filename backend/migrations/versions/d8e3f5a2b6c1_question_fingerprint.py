@@ -0,0 +1,32 @@
+"""Impressão digital das questões (deduplicação no import)
+
+Revision ID: d8e3f5a2b6c1
+Revises: c4d9e2f7a1b3
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3f5a2b6c1'
+down_revision = 'c4d9e2f7a1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'questions' not in inspector.get_table_names(): return
+    if 'fingerprint' not in {c['name'] for c in inspector.get_columns('questions')}:
+        op.add_column('questions', sa.Column('fingerprint', sa.String(64), nullable=True))
+    # Não único: o caminho da IA continua inserindo sem checar; as questões antigas são
+    # preenchidas por import_questions.py (backfill_fingerprints) antes do primeiro import
+    op.create_index('ix_questions_fingerprint', 'questions', ['fingerprint'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_questions_fingerprint', table_name='questions', if_exists=True)
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_column('fingerprint')
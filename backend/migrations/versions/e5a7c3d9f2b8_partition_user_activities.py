@@ -0,0 +1,135 @@
+"""user_activities particionada por mês + tabelas de compactação
+
+Revision ID: e5a7c3d9f2b8
+Revises: d8e3f5a2b6c1
+Create Date: 2026-10-18 20:00:00.000000
+
+Em todos os bancos: cria user_seen_questions e user_activity_summaries (compact_activities.py).
+
+Só no Postgres: recria user_activities como PARTITION BY RANGE (timestamp), uma partição
+por mês (user_activities_pYYYYMM) desde a atividade mais antiga até 3 meses à frente, mais
+user_activities_default para o que cair fora. A PK passa a ser (id, timestamp), exigência do
+particionamento; a sequência de id é mantida. O copy reescreve a tabela inteira: rode em
+janela de manutenção. Meses futuros são criados por compact_activities.py --ensure-partitions.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c3d9f2b8'
+down_revision = 'd8e3f5a2b6c1'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, user_id, question_id, user_answer, is_correct, timestamp"
+
+
+def _add_months(d, n):
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _is_partitioned(bind):
+    return bind.exec_driver_sql(
+        "SELECT c.relkind = 'p' FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'user_activities' AND n.nspname = current_schema()").scalar()
+
+
+def _partition_user_activities(bind):
+    oldest = bind.exec_driver_sql("SELECT min(timestamp) FROM user_activities").scalar()
+    today = date.today().replace(day=1)
+    month = (oldest.date().replace(day=1) if oldest else today)
+
+    op.execute("ALTER TABLE user_activities RENAME TO user_activities_unpartitioned")
+    op.execute("ALTER TABLE user_activities_unpartitioned RENAME CONSTRAINT user_activities_pkey TO user_activities_unpartitioned_pkey")
+    # Libera a sequência do id (senão some junto com a tabela antiga) e os nomes dos índices
+    op.execute("ALTER SEQUENCE user_activities_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX IF EXISTS ix_user_activities_user_question")
+    op.execute("""
+        CREATE TABLE user_activities (
+            id INTEGER NOT NULL DEFAULT nextval('user_activities_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            question_id INTEGER NOT NULL REFERENCES questions (id),
+            user_answer TEXT NOT NULL,
+            is_correct BOOLEAN NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE user_activities_id_seq OWNED BY user_activities.id")
+
+    end = _add_months(today, MONTHS_AHEAD + 1)
+    while month < end:
+        nxt = _add_months(month, 1)
+        op.execute(f"CREATE TABLE user_activities_p{month:%Y%m} PARTITION OF user_activities "
+                   f"FOR VALUES FROM ('{month}') TO ('{nxt}')")
+        month = nxt
+    op.execute("CREATE TABLE user_activities_default PARTITION OF user_activities DEFAULT")
+
+    # Linhas sem timestamp (anteriores ao default da coluna) ficam com a data da migração
+    op.execute(f"""
+        INSERT INTO user_activities ({COLUMNS})
+        SELECT id, user_id, question_id, user_answer, is_correct, COALESCE(timestamp, now() AT TIME ZONE 'utc')
+        FROM user_activities_unpartitioned
+    """)
+    op.execute("DROP TABLE user_activities_unpartitioned")
+    # Índice no pai: o Postgres cria um igual em cada partição (atuais e futuras)
+    op.execute("CREATE INDEX ix_user_activities_user_question ON user_activities (user_id, question_id)")
+    op.execute("ANALYZE user_activities")
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'user_seen_questions' not in tables:
+        op.create_table(
+            'user_seen_questions',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('question_id', sa.Integer(), sa.ForeignKey('questions.id'), primary_key=True),
+        )
+    if 'user_activity_summaries' not in tables:
+        op.create_table(
+            'user_activity_summaries',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('month', sa.Date(), nullable=False),
+            sa.Column('topic', sa.String(100), nullable=False, server_default=''),
+            sa.Column('difficulty', sa.String(20), nullable=False, server_default=''),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('correct', sa.Integer(), nullable=False, server_default='0'),
+            sa.UniqueConstraint('user_id', 'month', 'topic', 'difficulty', name='uq_user_activity_summaries_key'),
+        )
+
+    if bind.dialect.name == 'postgresql' and 'user_activities' in tables and not _is_partitioned(bind):
+        _partition_user_activities(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql' and _is_partitioned(bind):
+        op.execute("ALTER TABLE user_activities RENAME TO user_activities_partitioned")
+        op.execute("ALTER TABLE user_activities_partitioned RENAME CONSTRAINT user_activities_pkey TO user_activities_partitioned_pkey")
+        op.execute("ALTER SEQUENCE user_activities_id_seq OWNED BY NONE")
+        op.execute("DROP INDEX IF EXISTS ix_user_activities_user_question")
+        op.execute("""
+            CREATE TABLE user_activities (
+                id INTEGER PRIMARY KEY DEFAULT nextval('user_activities_id_seq'),
+                user_id INTEGER NOT NULL REFERENCES users (id),
+                question_id INTEGER NOT NULL REFERENCES questions (id),
+                user_answer TEXT NOT NULL,
+                is_correct BOOLEAN NOT NULL,
+                timestamp TIMESTAMP WITHOUT TIME ZONE
+            )
+        """)
+        op.execute("ALTER SEQUENCE user_activities_id_seq OWNED BY user_activities.id")
+        op.execute(f"INSERT INTO user_activities ({COLUMNS}) SELECT {COLUMNS} FROM user_activities_partitioned")
+        op.execute("DROP TABLE user_activities_partitioned")
+        op.execute("CREATE INDEX ix_user_activities_user_question ON user_activities (user_id, question_id)")
+    # Atividades já compactadas não voltam para user_activities: os resumos são perdidos
+    op.drop_table('user_activity_summaries')
+    op.drop_table('user_seen_questions')
@@ -0,0 +1,34 @@
+"""user_seen_questions passa a ter todas as questões respondidas
+
+Revision ID: f2b9d4c7e1a3
+Revises: e5a7c3d9f2b8
+Create Date: 2026-10-18 22:00:00.000000
+
+O submit grava em user_seen_questions (stats.mark_seen) e o sorteio só consulta essa tabela.
+Aqui copiamos os pares (user_id, question_id) das atividades ainda não compactadas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b9d4c7e1a3'
+down_revision = 'e5a7c3d9f2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if 'user_activities' not in tables or 'user_seen_questions' not in tables: return
+    op.execute(
+        "INSERT INTO user_seen_questions (user_id, question_id) "
+        "SELECT DISTINCT a.user_id, a.question_id FROM user_activities a "
+        "WHERE NOT EXISTS (SELECT 1 FROM user_seen_questions s "
+        "WHERE s.user_id = a.user_id AND s.question_id = a.question_id)")
+
+
+def downgrade():
+    # As linhas copiadas são indistinguíveis das gravadas pelo submit; ficam onde estão
+    pass
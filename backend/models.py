@@ -1,8 +1,21 @@
+import hashlib
+import random
+import re
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
 db = SQLAlchemy()
 
+def question_fingerprint(statement, options):
+    """Identidade de uma questão para deduplicação: enunciado + opções (sem ordem), normalizados."""
+    norm = lambda t: re.sub(r'\s+', ' ', str(t)).strip().casefold()
+    key = norm(statement) + '\x1f' + '\x1f'.join(sorted(norm(o) for o in options or []))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _fingerprint_default(context):
+    p = context.get_current_parameters()
+    return question_fingerprint(p['statement'], p['options'])
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -14,10 +27,22 @@ class User(db.Model):
     level = db.Column(db.String(20), default='Iniciante')
     score = db.Column(db.Integer, default=0)
     total_activities = db.Column(db.Integer, default=0)
+    correct_answers = db.Column(db.Integer, default=0)
     accuracy = db.Column(db.Float, default=0.0)
     
     # Novo campo para assinatura
     is_premium = db.Column(db.Boolean, default=False)
+
+    # Conquistas já obtidas como bitset (bit = AchievementRule.bit); NULL = ainda não sincronizado
+    badges_mask = db.Column(db.BigInteger, nullable=True)
+
+    # Versão dos dados exibidos nas telas do usuário (perfil, conquistas, progresso): base do ETag
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Habilidade estimada (escala logit, ver calibrate.py); NULL = ainda não calibrado
+    ability = db.Column(db.Float, nullable=True)
+    ability_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     activities = db.relationship('UserActivity', backref='user', lazy=True)
     achievements = db.relationship('Achievement', backref='user', lazy=True)
@@ -34,8 +59,20 @@ class User(db.Model):
             'isPremium': self.is_premium  # Retorna o status no JSON
         }
 
+    def bump_data_version(self):
+        """Invalida os ETags do usuário. Chamar em toda escrita que muda perfil, conquistas ou progresso."""
+        self.data_version = db.func.coalesce(User.data_version, 0) + 1
+        self.data_updated_at = datetime.utcnow()
+
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (
+        db.Index('ix_questions_difficulty_random_key', 'difficulty', 'random_key'),
+        db.Index('ix_questions_difficulty_topic_random_key', 'difficulty', 'topic', 'random_key'),
+        db.Index('ix_questions_calibrated_difficulty', 'calibrated_difficulty'),
+        db.Index('ix_questions_topic_calibrated_difficulty', 'topic', 'calibrated_difficulty'),
+        db.Index('ix_questions_fingerprint', 'fingerprint'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     statement = db.Column(db.Text, nullable=False)
@@ -43,6 +80,13 @@ class Question(db.Model):
     correct_answer = db.Column(db.Text, nullable=False)
     difficulty = db.Column(db.String(20), nullable=False)
     topic = db.Column(db.String(100)) 
+    # Chave aleatória fixa e indexada: permite sortear sem ORDER BY random()
+    random_key = db.Column(db.Float, default=random.random)
+    # Dificuldade ajustada pelas respostas (escala logit, ver calibrate.py); NULL = ainda não calibrada
+    calibrated_difficulty = db.Column(db.Float, nullable=True)
+    calibration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # sha256 de question_fingerprint(); preenchida em todo insert (import_questions.py deduplica por ela)
+    fingerprint = db.Column(db.String(64), default=_fingerprint_default)
 
     def to_dict(self):
         return {
@@ -54,7 +98,10 @@ class Question(db.Model):
         }
 
 class UserActivity(db.Model):
+    # No Postgres, particionada por mês em timestamp (PK real: id, timestamp); meses antigos
+    # são compactados em UserActivitySummary + UserSeenQuestion por compact_activities.py
     __tablename__ = 'user_activities'
+    __table_args__ = (db.Index('ix_user_activities_user_question', 'user_id', 'question_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -64,8 +111,42 @@ class UserActivity(db.Model):
     is_correct = db.Column(db.Boolean, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class UserStat(db.Model):
+    # Contadores incrementais por usuário, por tópico ou por dificuldade
+    __tablename__ = 'user_stats'
+    __table_args__ = (db.UniqueConstraint('user_id', 'dimension', 'key', name='uq_user_stats_user_dimension_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)  # 'topic' ou 'difficulty'
+    key = db.Column(db.String(100), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'dimension': self.dimension,
+            'key': self.key,
+            'attempts': self.attempts,
+            'correct': self.correct,
+            'accuracy': round(self.correct * 100 / self.attempts, 1) if self.attempts else 0.0
+        }
+
+class UserProgressDaily(db.Model):
+    # Rollup usuário x dia x tópico, mantido no submit (alimenta /api/user/progress)
+    __tablename__ = 'user_progress_daily'
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', 'topic', name='uq_user_progress_daily_user_day_topic'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    topic = db.Column(db.String(100), nullable=False, default='')  # '' quando a questão não tem tópico
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+
 class Achievement(db.Model):
     __tablename__ = 'achievements'
+    __table_args__ = (db.Index('ix_achievements_user_id_title', 'user_id', 'title'),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -81,4 +162,60 @@ class Achievement(db.Model):
             'description': self.description,
             'icon': self.icon_name,
             'date': self.earned_at.strftime('%d/%m/%Y')
-        }
\ No newline at end of file
+        }
+
+class SubmitReceipt(db.Model):
+    # Resultado de cada rodada enviada com chave de idempotência (reenvios devolvem o mesmo resultado)
+    __tablename__ = 'submit_receipts'
+    __table_args__ = (db.UniqueConstraint('user_id', 'idempotency_key', name='uq_submit_receipts_user_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    response = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AiFeedback(db.Model):
+    # Cache persistente do feedback do tutor IA por (questão, resposta, acerto, versão do prompt)
+    __tablename__ = 'ai_feedback'
+    __table_args__ = (
+        db.UniqueConstraint('question_id', 'answer_hash', 'is_correct', 'prompt_version', name='uq_ai_feedback_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    answer_hash = db.Column(db.String(40), nullable=False)  # sha1 da resposta normalizada
+    is_correct = db.Column(db.Boolean, nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False, default=1)
+    feedback = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CalibrationCheckpoint(db.Model):
+    # Até onde (id de user_activities) a calibração já processou; o próximo incremental continua daqui
+    __tablename__ = 'calibration_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    last_activity_id = db.Column(db.BigInteger, nullable=False, default=0)
+    answers_processed = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserSeenQuestion(db.Model):
+    # Questões já respondidas: gravada no submit e mantida quando as atividades são compactadas (o sorteio só consulta esta)
+    __tablename__ = 'user_seen_questions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+
+class UserActivitySummary(db.Model):
+    # Atividades compactadas: usuário x mês x tópico x dificuldade (alimenta rebuild_stats.py)
+    __tablename__ = 'user_activity_summaries'
+    __table_args__ = (db.UniqueConstraint('user_id', 'month', 'topic', 'difficulty', name='uq_user_activity_summaries_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # primeiro dia do mês
+    topic = db.Column(db.String(100), nullable=False, default='')
+    difficulty = db.Column(db.String(20), nullable=False, default='')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
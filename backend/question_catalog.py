@@ -0,0 +1,108 @@
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from models import Question
+
+CatalogEntry = namedtuple('CatalogEntry', [
+    'id', 'statement', 'correct_answer', 'normalized_answer', 'difficulty', 'topic', 'payload', 'payload_json'
+])
+
+
+class QuestionCatalog:
+    """Cache em memória (por processo) das questões, que nunca mudam depois de inseridas.
+
+    Guarda o payload de to_dict() já serializado e a resposta correta já normalizada.
+    Modo completo: carrega tudo na primeira consulta. Modo limitado (max_entries > 0): LRU.
+    Nos dois, ids ausentes são buscados no banco pela PK (inclui questões commitadas fora de
+    ordem de id por reabastecimentos, seeds ou imports concorrentes).
+    """
+
+    def __init__(self, normalize, max_entries=0):
+        self.normalize = normalize
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._max_id = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # carga inicial do modo completo, uma vez por processo
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('QUESTION_CATALOG_MAX_ENTRIES', self.max_entries)
+
+    @property
+    def bounded(self):
+        return self.max_entries > 0
+
+    def _entry(self, q):
+        payload = q.to_dict()
+        return CatalogEntry(
+            q.id, q.statement, q.correct_answer, self.normalize(q.correct_answer),
+            q.difficulty, q.topic, payload, json.dumps(payload, ensure_ascii=False)
+        )
+
+    def _store(self, questions):
+        entries = {q.id: self._entry(q) for q in questions}
+        with self._lock:
+            self._entries.update(entries)
+            if entries: self._max_id = max(self._max_id, max(entries))
+            if self.bounded:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entries
+
+    def refresh(self):
+        """Carrega as questões inseridas depois do último max_id visto (carga inicial do modo completo)."""
+        if self.bounded: return 0
+        new = Question.query.filter(Question.id > self._max_id).order_by(Question.id).all()
+        self._store(new)
+        self._loaded = True
+        return len(new)
+
+    def _initial_load(self):
+        # Requisições que chegam com o processo frio esperam a mesma carga em vez de repeti-la
+        with self._load_lock:
+            if not self._loaded: self.refresh()
+
+    def get_many(self, ids):
+        """Retorna {id: CatalogEntry} para os ids existentes (ids inexistentes são omitidos)."""
+        if not self.bounded and not self._loaded: self._initial_load()
+
+        found, missing = {}, []
+        with self._lock:
+            for i in ids:
+                e = self._entries.get(i)
+                if e is None:
+                    missing.append(i)
+                    continue
+                found[i] = e
+                if self.bounded: self._entries.move_to_end(i)
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            found.update(self._store(Question.query.filter(Question.id.in_(missing)).all()))
+        return found
+
+    def get(self, qid):
+        return self.get_many([qid]).get(qid)
+
+    def payloads_json(self, ids):
+        """Lista JSON pronta (na ordem de ids) montada a partir dos payloads pré-serializados."""
+        entries = self.get_many(ids)
+        return '[' + ','.join(entries[i].payload_json for i in ids if i in entries) + ']'
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._max_id = 0
+            self._loaded = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries), 'max_id': self._max_id, 'bounded': self.bounded,
+                'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses
+            }
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import db, Question, User, UserSeenQuestion
+
+
+class QuestionPool:
+    """Reabastece o banco de questões em background, mantendo um estoque mínimo
+    (low-water mark) por dificuldade/tópico para que /api/activities/next nunca espere a IA.
+
+    O estoque ("depth") é o de questões inéditas: total da dificuldade/tópico menos o que já
+    viu o mais adiantado dos usuários ativos (active_users com mais atividades entre os que
+    usaram o app nos últimos active_days). Quem ainda assim esgotar as inéditas avisa por
+    notify_shortage().
+    """
+
+    def __init__(self, generate_fn, difficulties, topics):
+        # generate_fn(difficulty, topic, count) -> quantidade de questões salvas
+        self.generate_fn = generate_fn
+        self.difficulties = list(difficulties)
+        self.topics = list(topics)
+        self.app = None
+        self.low_water = 3
+        self.batch_size = 5
+        self.interval = 60
+        self.active_users = 50
+        self.active_days = 7
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._depth = {}
+        self._shortages = {d: 0 for d in self.difficulties}
+        self._latencies = {d: deque(maxlen=50) for d in self.difficulties}
+        self._generated = {d: 0 for d in self.difficulties}
+        self._last_refill = {d: None for d in self.difficulties}
+
+    def init_app(self, app):
+        self.app = app
+        self.low_water = app.config.get('QUESTION_POOL_LOW_WATER', self.low_water)
+        self.batch_size = app.config.get('QUESTION_POOL_BATCH_SIZE', self.batch_size)
+        self.interval = app.config.get('QUESTION_POOL_INTERVAL', self.interval)
+        self.active_users = app.config.get('QUESTION_POOL_ACTIVE_USERS', self.active_users)
+        self.active_days = app.config.get('QUESTION_POOL_ACTIVE_DAYS', self.active_days)
+
+    def ensure_started(self):
+        """Inicia a thread de reabastecimento na primeira chamada (idempotente)."""
+        if self._thread is not None or self.app is None: return
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._run, name='question-pool', daemon=True)
+            self._thread.start()
+            print(f"🧺 Reabastecedor de questões iniciado (mínimo {self.low_water} por dificuldade/tópico).")
+
+    def notify_shortage(self, difficulty, missing):
+        """Registra que um usuário ficou sem questões inéditas nesta dificuldade."""
+        if difficulty not in self._shortages or missing <= 0: return
+        with self._lock:
+            self._shortages[difficulty] = max(self._shortages[difficulty], missing)
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            depth = {d: 0 for d in self.difficulties}
+            for (d, _), c in self._depth.items():
+                if d in depth: depth[d] += c
+            out = {}
+            for d in self.difficulties:
+                lat = list(self._latencies[d])
+                out[d] = {
+                    'depth': depth[d],
+                    'topics': {t: c for (dd, t), c in self._depth.items() if dd == d},
+                    'pending_shortage': self._shortages[d],
+                    'generated': self._generated[d],
+                    'refill_latency_avg_s': round(sum(lat) / len(lat), 3) if lat else None,
+                    'refill_latency_last_s': round(lat[-1], 3) if lat else None,
+                    'last_refill_at': self._last_refill[d],
+                }
+            return {'running': self._thread is not None, 'low_water': self.low_water, 'active_users': self.active_users,
+                    'active_days': self.active_days, 'difficulties': out}
+
+    # --- Loop de background ---
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self._refill_once()
+            except Exception as e:
+                print(f"⚠️ Erro no reabastecedor de questões: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _max_seen(self):
+        """{(dificuldade, tópico): maior nº de questões já vistas por um dos usuários ativos}."""
+        if self.active_users <= 0: return {}
+        cutoff = datetime.utcnow() - timedelta(days=self.active_days)
+        ids = [uid for (uid,) in db.session.query(User.id).filter(User.data_updated_at >= cutoff)
+               .order_by(User.total_activities.desc()).limit(self.active_users)]
+        if not ids: return {}
+        rows = db.session.query(UserSeenQuestion.user_id, Question.difficulty, Question.topic, func.count()) \
+            .join(Question, Question.id == UserSeenQuestion.question_id) \
+            .filter(UserSeenQuestion.user_id.in_(ids)) \
+            .group_by(UserSeenQuestion.user_id, Question.difficulty, Question.topic).all()
+        out = {}
+        for _, d, t, c in rows:
+            out[(d, t)] = max(out.get((d, t), 0), c)
+        return out
+
+    def _count_depth(self):
+        rows = db.session.query(Question.difficulty, Question.topic, func.count(Question.id)) \
+            .group_by(Question.difficulty, Question.topic).all()
+        seen = self._max_seen()
+        depth = {(d, t): c - seen.get((d, t), 0) for d, t, c in rows}
+        with self._lock:
+            self._depth = depth
+        return depth
+
+    def _refill_once(self):
+        depth = self._count_depth()
+        for d in self.difficulties:
+            # Primeiro garante o mínimo por tópico...
+            for t in self.topics:
+                missing = self.low_water - depth.get((d, t), 0)
+                if missing > 0:
+                    self._generate(d, t, min(missing, self.batch_size))
+
+            # ...depois atende a demanda de usuários que esgotaram as inéditas
+            with self._lock:
+                shortage, self._shortages[d] = self._shortages[d], 0
+            for i in range(0, shortage, self.batch_size):
+                t = self.topics[(i // self.batch_size) % len(self.topics)]
+                self._generate(d, t, min(self.batch_size, shortage - i))
+        self._count_depth()
+
+    def _generate(self, difficulty, topic, count):
+        start = time.perf_counter()
+        created = self.generate_fn(difficulty, topic, count) or 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies[difficulty].append(elapsed)
+            self._generated[difficulty] += created
+            self._last_refill[difficulty] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return created
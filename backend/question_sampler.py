@@ -0,0 +1,88 @@
+import random
+
+from models import db, Question, UserSeenQuestion
+
+
+def _scan(difficulty, topic, start, limit, exclude):
+    """Lê até `limit` ids a partir de `start` no índice (difficulty[, topic], random_key), com volta ao início."""
+    base = db.session.query(Question.id).filter(Question.difficulty == difficulty)
+    if topic: base = base.filter(Question.topic == topic)
+    found = [i for (i,) in base.filter(Question.random_key >= start).order_by(Question.random_key).limit(limit)]
+    if len(found) < limit:
+        found += [i for (i,) in base.filter(Question.random_key < start).order_by(Question.random_key).limit(limit - len(found))]
+    return [i for i in found if i not in exclude]
+
+def sample_questions(difficulty, n, topic=None, exclude=()):
+    """Sorteia n ids de questões distintas da dificuldade, sem filtrar as já vistas (usado como revisão)."""
+    exclude = set(exclude)
+    found = _scan(difficulty, topic, random.random(), n + len(exclude), exclude)
+    return found[:n]
+
+def _filter_unseen(user_id, cand):
+    """Remove dos candidatos as questões que o usuário já respondeu (PK user_id, question_id).
+
+    user_seen_questions é gravada no submit (stats.mark_seen) e guarda também o histórico dos
+    meses compactados, então o sorteio não consulta nenhuma partição de user_activities.
+    """
+    seen = {qid for (qid,) in db.session.query(UserSeenQuestion.question_id)
+            .filter(UserSeenQuestion.user_id == user_id, UserSeenQuestion.question_id.in_(cand))}
+    return [i for i in cand if i not in seen]
+
+def sample_unseen_questions(user_id, difficulty, n, topic=None, exclude=(), max_rounds=4, oversample=4):
+    """Sorteia até n ids de questões que o usuário ainda não respondeu.
+
+    Em vez de ordenar o balde inteiro e fazer anti-join com todo o histórico, cada rodada
+    lê uma faixa curta do índice por random_key e consulta o histórico só para esses
+    candidatos (índice user_id, question_id). O custo por rodada é limitado por n * oversample,
+    e o oversample dobra quando o usuário já viu boa parte do banco.
+    """
+    picked, tried = [], set(exclude)
+    for _ in range(max_rounds):
+        need = n - len(picked)
+        if need <= 0: break
+        cand = _scan(difficulty, topic, random.random(), need * oversample, tried)
+        if not cand: break
+        tried.update(cand)
+        picked += _filter_unseen(user_id, cand)[:need]
+        oversample *= 2
+    return picked
+
+def _scan_range(lo, hi, topic, limit, exclude):
+    """Lê até `limit` ids com calibrated_difficulty em [lo, hi], começando num ponto sorteado da faixa."""
+    start = random.uniform(lo, hi)
+    base = db.session.query(Question.id).filter(Question.calibrated_difficulty.isnot(None))
+    if topic: base = base.filter(Question.topic == topic)
+    found = [i for (i,) in base.filter(Question.calibrated_difficulty >= start, Question.calibrated_difficulty <= hi)
+             .order_by(Question.calibrated_difficulty).limit(limit)]
+    if len(found) < limit:
+        found += [i for (i,) in base.filter(Question.calibrated_difficulty >= lo, Question.calibrated_difficulty < start)
+                  .order_by(Question.calibrated_difficulty).limit(limit - len(found))]
+    return [i for i in found if i not in exclude]
+
+def sample_questions_near(user_id, target, n, topic=None, window=0.5, exclude=(), max_rounds=4, oversample=4):
+    """Sorteia até n questões não vistas com dificuldade calibrada perto de `target` (escala logit).
+
+    Busca por faixa no índice (topic, calibrated_difficulty): começa em target ± window e
+    dobra a janela e o oversample a cada rodada em que faltam questões.
+    """
+    picked, tried = [], set(exclude)
+    for _ in range(max_rounds):
+        need = n - len(picked)
+        if need <= 0: break
+        cand = _scan_range(target - window, target + window, topic, need * oversample, tried)
+        tried.update(cand)
+        if cand: picked += _filter_unseen(user_id, cand)[:need]
+        window *= 2
+        oversample *= 2
+    return picked
+
+def backfill_random_keys(batch_size=5000):
+    """Preenche random_key das questões antigas (criadas antes da coluna existir)."""
+    total = 0
+    while True:
+        ids = [i for (i,) in db.session.query(Question.id).filter(Question.random_key.is_(None)).limit(batch_size)]
+        if not ids: break
+        db.session.bulk_update_mappings(Question, [{'id': i, 'random_key': random.random()} for i in ids])
+        db.session.commit()
+        total += len(ids)
+    return total
@@ -0,0 +1,129 @@
+import argparse
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db, User, Question, UserActivity, UserStat, UserProgressDaily, UserActivitySummary
+from stats import compute_accuracy
+from question_sampler import backfill_random_keys
+from metrics import metrics
+from compact_activities import compacted_until
+
+
+def aggregate_from_history():
+    """Agrega todo o histórico direto no banco (GROUP BY): user_activities + meses compactados."""
+    correct = db.func.sum(db.case((UserActivity.is_correct, 1), else_=0))
+    totals = {
+        uid: (int(n), int(c or 0))
+        for uid, n, c in db.session.query(UserActivity.user_id, db.func.count(UserActivity.id), correct)
+        .group_by(UserActivity.user_id)
+    }
+    per_key = {}
+    for dimension, column in (('topic', Question.topic), ('difficulty', Question.difficulty)):
+        rows = db.session.query(UserActivity.user_id, column, db.func.count(UserActivity.id), correct) \
+            .join(Question, UserActivity.question_id == Question.id) \
+            .filter(column.isnot(None)) \
+            .group_by(UserActivity.user_id, column)
+        for uid, key, n, c in rows:
+            per_key[(uid, dimension, key)] = (int(n), int(c or 0))
+
+    for dimension, column in (('topic', UserActivitySummary.topic), ('difficulty', UserActivitySummary.difficulty)):
+        rows = db.session.query(UserActivitySummary.user_id, column,
+                                db.func.sum(UserActivitySummary.attempts), db.func.sum(UserActivitySummary.correct)) \
+            .group_by(UserActivitySummary.user_id, column)
+        for uid, key, n, c in rows:
+            if dimension == 'topic':
+                pn, pc = totals.get(uid, (0, 0))
+                totals[uid] = (pn + int(n), pc + int(c or 0))
+            if not key: continue  # '' = questão sem tópico
+            pn, pc = per_key.get((uid, dimension, key), (0, 0))
+            per_key[(uid, dimension, key)] = (pn + int(n), pc + int(c or 0))
+    return totals, per_key
+
+def rebuild(dry_run=False):
+    totals, per_key = aggregate_from_history()
+
+    drift = 0
+    for u in User.query.all():
+        n, c = totals.get(u.id, (0, 0))
+        if (u.total_activities or 0, u.correct_answers or 0) != (n, c):
+            drift += 1
+            print(f"   ↺ Usuário {u.id}: {u.total_activities}/{u.correct_answers} -> {n}/{c}")
+        u.total_activities, u.correct_answers = n, c
+        u.accuracy = compute_accuracy(c, n)
+
+    current = {(s.user_id, s.dimension, s.key): (s.attempts, s.correct) for s in UserStat.query.all()}
+    drift_keys = sum(1 for k in set(current) | set(per_key) if current.get(k) != per_key.get(k))
+
+    if dry_run:
+        db.session.rollback()
+        print(f"🔎 Divergências: {drift} usuários, {drift_keys} contadores por tópico/dificuldade.")
+        return
+
+    UserStat.query.delete()
+    db.session.add_all([
+        UserStat(user_id=uid, dimension=dimension, key=key, attempts=n, correct=c)
+        for (uid, dimension, key), (n, c) in per_key.items()
+    ])
+    db.session.commit()
+    print(f"✅ Contadores reconstruídos: {drift} usuários e {drift_keys} contadores corrigidos.")
+
+
+def rebuild_progress_rollups(chunksize=50000):
+    """Reconstrói user_progress_daily a partir do histórico (pandas, em blocos).
+
+    Dias de meses já compactados não têm mais as linhas de origem: ficam como estão.
+    """
+    import pandas as pd
+    since = compacted_until()
+    query = text("""
+        SELECT ua.user_id, ua.timestamp, ua.is_correct, q.topic
+        FROM user_activities ua
+        JOIN questions q ON ua.question_id = q.id
+    """ + ("WHERE ua.timestamp >= :since" if since else "")).bindparams(**({'since': since} if since else {}))
+
+    parts = []
+    with db.engine.connect() as conn, metrics.stage('dataframe'):
+        for df in pd.read_sql(query, conn, chunksize=chunksize):
+            df['day'] = pd.to_datetime(df['timestamp']).dt.date
+            df['topic'] = df['topic'].fillna('')
+            df['is_correct'] = df['is_correct'].astype(int)
+            parts.append(df.groupby(['user_id', 'day', 'topic'])['is_correct'].agg(['count', 'sum']))
+
+    progress = UserProgressDaily.query
+    if since: progress = progress.filter(UserProgressDaily.day >= since)
+    progress.delete(synchronize_session=False)
+    if parts:
+        # Um mesmo (usuário, dia, tópico) pode aparecer em mais de um bloco
+        rollup = pd.concat(parts).groupby(level=[0, 1, 2]).sum()
+        db.session.add_all([
+            UserProgressDaily(user_id=int(uid), day=day, topic=topic, attempts=int(n), correct=int(c))
+            for (uid, day, topic), (n, c) in zip(rollup.index, rollup[['count', 'sum']].itertuples(index=False))
+        ])
+    db.session.commit()
+    print(f"✅ Rollups de progresso reconstruídos ({sum(len(p) for p in parts)} grupos lidos).")
+
+
+def invalidate_user_caches():
+    """Incrementa data_version de todos os usuários: os ETags antigos de perfil/progresso deixam de valer."""
+    User.query.update({User.data_version: db.func.coalesce(User.data_version, 0) + 1}, synchronize_session=False)
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconstrói os contadores de estatísticas a partir do histórico.")
+    parser.add_argument('--dry-run', action='store_true', help="Apenas reporta divergências, sem gravar.")
+    parser.add_argument('--skip-progress', action='store_true', help="Não reconstrói os rollups de progresso.")
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        try:
+            if not args.dry_run:
+                filled = backfill_random_keys()
+                if filled: print(f"🎲 random_key preenchida em {filled} questões antigas.")
+            rebuild(dry_run=args.dry_run)
+            if not args.dry_run and not args.skip_progress: rebuild_progress_rollups()
+            if not args.dry_run: invalidate_user_caches()
+        except Exception as e:
+            print(f"❌ Erro ao reconstruir estatísticas: {e}")
+            db.session.rollback()
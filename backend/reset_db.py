@@ -1,10 +1,10 @@
-from app import app
+from app import create_app
 from models import db
 from sqlalchemy import text
 
 
 if __name__ == '__main__':
-    with app.app_context():
+    with create_app().app_context():
         print("☢️  Iniciando limpeza nuclear do banco de dados...")
         
         try:
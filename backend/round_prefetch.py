@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+
+class _Round:
+    __slots__ = ('level', 'body', 'ready_at', 'build_s', 'done', 'cancelled')
+
+    def __init__(self, level):
+        self.level = level
+        self.body = None
+        self.ready_at = None
+        self.build_s = 0.0
+        self.done = threading.Event()
+        self.cancelled = False
+
+
+class RoundPrefetcher:
+    """Monta a próxima rodada do usuário em background logo depois do submit.
+
+    submit() chama schedule() depois do commit, já com o nível novo; o build roda num pool
+    pequeno de threads com app_context próprio. next_q chama take(): se a rodada pronta é do
+    nível atual e não expirou, serve o corpo já serializado sem sortear nada. Se o build ainda
+    está rodando, espera até ROUND_PREFETCH_WAIT_MS. Cada rodada é servida uma vez.
+    Em memória por processo: com vários workers, o next que cai em outro processo é miss.
+    """
+
+    def __init__(self, build, max_workers=2, ttl=300, wait_ms=250, max_entries=10000):
+        self.build = build  # build(user_id) -> (nível, corpo JSON) ou None
+        self.enabled = True
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.wait_ms = wait_ms
+        self.max_entries = max_entries
+        self.app = None
+        self._executor = None
+        self._rounds = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'scheduled': 0, 'hits': 0, 'misses': 0, 'expired': 0, 'stale_level': 0,
+                         'wait_timeout': 0, 'build_errors': 0}
+        self.saved_s = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        c = app.config
+        self.enabled = c.get('ROUND_PREFETCH_ENABLED', self.enabled)
+        self.max_workers = c.get('ROUND_PREFETCH_WORKERS', self.max_workers)
+        self.ttl = c.get('ROUND_PREFETCH_TTL', self.ttl)
+        self.wait_ms = c.get('ROUND_PREFETCH_WAIT_MS', self.wait_ms)
+        self.max_entries = c.get('ROUND_PREFETCH_MAX_ENTRIES', self.max_entries)
+
+    def _count(self, key, outcome=None):
+        with self._lock:
+            self.counters[key] += 1
+        if outcome: metrics.round_prefetch.inc(outcome=outcome)
+
+    def schedule(self, user_id, level):
+        """Agenda a montagem da próxima rodada (chamar depois do commit do submit)."""
+        if not self.enabled or self.app is None: return
+        entry = _Round(level)
+        with self._lock:
+            old = self._rounds.pop(user_id, None)
+            if old: old.cancelled = True
+            self._rounds[user_id] = entry
+            while len(self._rounds) > self.max_entries:
+                self._rounds.popitem(last=False)[1].cancelled = True
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='round-prefetch')
+            self.counters['scheduled'] += 1
+        self._executor.submit(self._run, user_id, entry)
+
+    def _run(self, user_id, entry):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                built = self.build(user_id) if not entry.cancelled else None
+            if built: entry.level, entry.body = built
+        except Exception as e:
+            self._count('build_errors')
+            print(f"⚠️ Erro ao pré-montar rodada do usuário {user_id}: {e}")
+        finally:
+            entry.build_s = time.perf_counter() - start
+            entry.ready_at = time.monotonic()
+            entry.done.set()
+            metrics.observe(metrics.stages, entry.build_s, stage='round_prefetch_build')
+
+    def invalidate(self, user_id):
+        with self._lock:
+            entry = self._rounds.pop(user_id, None)
+        if entry: entry.cancelled = True
+
+    def take(self, user_id, level):
+        """Corpo JSON da rodada pré-montada para o usuário no nível `level`, ou None (miss)."""
+        if not self.enabled: return None
+        with self._lock:
+            entry = self._rounds.pop(user_id, None)
+        if entry is None:
+            self._count('misses', 'miss')
+            return None
+
+        waited = 0.0
+        if not entry.done.is_set():
+            start = time.perf_counter()
+            finished = entry.done.wait(self.wait_ms / 1000)
+            waited = time.perf_counter() - start
+            if not finished:
+                entry.cancelled = True
+                self._count('wait_timeout', 'wait_timeout')
+                return None
+        if entry.body is None:
+            self._count('misses', 'miss')
+            return None
+        if entry.level != level:
+            self._count('stale_level', 'stale_level')
+            return None
+        if time.monotonic() - entry.ready_at > self.ttl:
+            self._count('expired', 'expired')
+            return None
+
+        # Economia: o que o sorteio custou em background, menos o que o next esperou por ele
+        saved = max(entry.build_s - waited, 0.0)
+        with self._lock:
+            self.counters['hits'] += 1
+            self.saved_s += saved
+        metrics.round_prefetch.inc(outcome='hit')
+        metrics.observe(metrics.round_prefetch_saved, saved)
+        return entry.body
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counters)
+            pending = len(self._rounds)
+            saved = self.saved_s
+        served = c['hits'] + c['misses'] + c['expired'] + c['stale_level'] + c['wait_timeout']
+        return {
+            'enabled': self.enabled, 'pending': pending, **c,
+            'hit_rate': round(c['hits'] / served, 4) if served else None,
+            'saved_total_s': round(saved, 3), 'saved_avg_ms': round(saved / c['hits'] * 1000, 2) if c['hits'] else None,
+            'ttl': self.ttl, 'wait_ms': self.wait_ms,
+        }
@@ -0,0 +1,42 @@
+"""Servidor do backend.
+
+SERVER_MODE=async (padrão): gevent com monkey patching. Cada requisição vira uma greenlet,
+então chamadas ao Gemini, Postgres e MongoDB cedem a vez em vez de prender uma thread,
+e um único processo atende centenas de rodadas simultâneas com as mesmas rotas do app.
+SERVER_MODE=threaded: servidor de threads do Werkzeug (comportamento antigo).
+"""
+import os
+
+ASYNC = os.getenv('SERVER_MODE', 'async') == 'async'
+
+if ASYNC:
+    # Precisa rodar antes de qualquer import que use sockets/threads
+    from gevent import monkey
+    monkey.patch_all()
+    os.environ.setdefault('GEMINI_TRANSPORT', 'rest')
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        print("⚠️ psycogreen não instalado: consultas ao Postgres vão bloquear o processo.")
+
+from app import create_app, activity_log
+
+app = create_app()
+
+
+def run(host='0.0.0.0', port=5000):
+    # Só o servidor retoma o spool de logs na subida; scripts e migrações não tocam no Mongo
+    activity_log.resume_spool()
+    if ASYNC:
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+        max_connections = int(os.getenv('SERVER_MAX_CONNECTIONS', 1000))
+        print(f"🚀 Servidor async (gevent) em {host}:{port}, até {max_connections} conexões.")
+        WSGIServer((host, port), app, spawn=Pool(max_connections), log=None).serve_forever()
+    else:
+        app.run(host=host, port=port, threaded=True)
+
+
+if __name__ == '__main__':
+    run(port=int(os.getenv('PORT', 5000)))
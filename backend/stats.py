@@ -0,0 +1,98 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, UserStat, UserProgressDaily, UserSeenQuestion
+
+
+def compute_accuracy(correct, total):
+    return round(correct * 100 / total, 1) if total else 0.0
+
+def record_answers(user, graded, day=None, score=0):
+    """Atualiza pontuação, contadores e rollups do usuário para uma rodada, sem commit.
+
+    graded: lista de (question, is_correct). Deve rodar na mesma transação que
+    insere os UserActivity correspondentes; o commit fica a cargo de quem chama.
+    """
+    if not graded and not score: return
+    day = day or datetime.now(timezone.utc).date()
+    n = len(graded)
+    c = sum(1 for _, ok in graded if ok)
+
+    # Incremento atômico no banco (sem ler o histórico)
+    db.session.query(User).filter(User.id == user.id).update({
+        User.total_activities: db.func.coalesce(User.total_activities, 0) + n,
+        User.correct_answers: db.func.coalesce(User.correct_answers, 0) + c,
+        User.score: db.func.coalesce(User.score, 0) + score,
+    }, synchronize_session=False)
+    db.session.refresh(user, ['total_activities', 'correct_answers', 'score'])
+    user.accuracy = compute_accuracy(user.correct_answers, user.total_activities)
+
+    deltas = defaultdict(lambda: [0, 0])
+    daily = defaultdict(lambda: [0, 0])
+    for q, ok in graded:
+        for dimension, key in (('topic', q.topic), ('difficulty', q.difficulty)):
+            if key is None: continue
+            deltas[(dimension, key)][0] += 1
+            deltas[(dimension, key)][1] += int(ok)
+        daily[q.topic or ''][0] += 1
+        daily[q.topic or ''][1] += int(ok)
+
+    for (dimension, key), (attempts, correct) in deltas.items():
+        _increment(UserStat, dict(user_id=user.id, dimension=dimension, key=key), attempts, correct)
+    for topic, (attempts, correct) in daily.items():
+        _increment(UserProgressDaily, dict(user_id=user.id, day=day, topic=topic), attempts, correct)
+    mark_seen(user.id, [q.id for q, _ in graded])
+
+def mark_seen(user_id, question_ids):
+    """Registra as questões respondidas em user_seen_questions (as já registradas são ignoradas)."""
+    rows = [{'user_id': user_id, 'question_id': qid} for qid in dict.fromkeys(question_ids)]
+    if not rows: return
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.session.execute(insert(UserSeenQuestion.__table__).values(rows).on_conflict_do_nothing())
+
+def _increment(model, keys, attempts, correct):
+    """UPDATE ... SET attempts = attempts + n; cria a linha se ainda não existir."""
+    def bump():
+        return db.session.query(model).filter_by(**keys).update({
+            model.attempts: model.attempts + attempts,
+            model.correct: model.correct + correct,
+        }, synchronize_session=False)
+
+    if bump(): return
+    try:
+        # Savepoint: outra requisição pode ter criado a linha ao mesmo tempo
+        with db.session.begin_nested():
+            db.session.add(model(attempts=attempts, correct=correct, **keys))
+    except IntegrityError:
+        bump()
+
+def get_progress(user_id, start=None, end=None):
+    """Monta os gráficos de progresso lendo apenas os rollups (sem varrer o histórico)."""
+    attempts, correct = db.func.sum(UserProgressDaily.attempts), db.func.sum(UserProgressDaily.correct)
+    window = [UserProgressDaily.user_id == user_id]
+    if start: window.append(UserProgressDaily.day >= start)
+    if end: window.append(UserProgressDaily.day <= end)
+
+    days = db.session.query(UserProgressDaily.day, attempts, correct) \
+        .filter(*window).group_by(UserProgressDaily.day).order_by(UserProgressDaily.day).all()
+    history = {
+        'labels': [d.strftime('%d/%m') for d, _, _ in days],
+        'data': [compute_accuracy(c, n) for _, n, c in days]
+    }
+
+    if start or end:
+        topic_rows = db.session.query(UserProgressDaily.topic, attempts, correct) \
+            .filter(*window, UserProgressDaily.topic != '').group_by(UserProgressDaily.topic).all()
+    else:
+        topic_rows = db.session.query(UserStat.key, UserStat.attempts, UserStat.correct) \
+            .filter_by(user_id=user_id, dimension='topic').all()
+    # Ordena para mostrar os melhores primeiro
+    topic_acc = sorted(((t, compute_accuracy(c, n)) for t, n, c in topic_rows if n), key=lambda x: x[1], reverse=True)
+    topics = {'labels': [t for t, _ in topic_acc], 'data': [a for _, a in topic_acc]}
+
+    return {'history': history, 'topics': topics}
@@ -0,0 +1,74 @@
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import timezone
+
+from flask import Response, request
+
+from models import db, User
+
+
+class UserResponseCache:
+    """Respostas condicionais (ETag / Last-Modified) para as telas do usuário.
+
+    A validade vem de User.data_version, incrementada em toda escrita que muda essas telas
+    (submit, subscribe, PUT do perfil, conquistas). Com o ETag igual a resposta é 304 sem
+    recalcular nada; senão o corpo já serializado sai de um LRU por (tela, usuário, versão).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'not_modified': 0, 'hits': 0, 'misses': 0}
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', self.max_entries)
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def respond(self, kind, user_id, build):
+        """Responde GET de uma tela do usuário. build() monta o payload (só roda em cache miss).
+
+        Retorna None se o usuário não existe.
+        """
+        row = db.session.query(User.data_version, User.data_updated_at).filter(User.id == user_id).first()
+        if row is None: return None
+        version, updated_at = row.data_version or 0, row.data_updated_at
+        variant = request.query_string.decode()
+        etag = f"{kind}-{user_id}-{version}" + (f"-{zlib.crc32(variant.encode()):x}" if variant else '')
+        last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0) if updated_at else None
+
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+        if last_modified: headers['Last-Modified'] = last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+        # If-None-Match tem precedência; If-Modified-Since só vale sem ele (RFC 9110)
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        else:
+            fresh = bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+        if fresh:
+            self._count('not_modified')
+            return Response(status=304, headers=headers)
+
+        key = (kind, user_id, version, variant)
+        with self._lock:
+            body = self._lru.get(key)
+            if body is not None: self._lru.move_to_end(key)
+        if body is not None:
+            self._count('hits')
+        else:
+            self._count('misses')
+            body = json.dumps(build(), ensure_ascii=False)
+            with self._lock:
+                self._lru[key] = body
+                while len(self._lru) > self.max_entries:
+                    self._lru.popitem(last=False)
+        return Response(body, mimetype='application/json', headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._lru), 'max_entries': self.max_entries, **self.counters}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { ArrowRight, CheckCircle, XCircle, Loader2, Sparkles, Trophy, X } from 'lucide-react';
 import type { UserData, Page, QuizResult, Question } from '../utils/types.ts';
 
@@ -17,6 +17,28 @@ const ActivitiesPage: React.FC<ActivitiesPageProps> = ({ user, setUser, setCurre
   const [selectedOption, setSelectedOption] = useState<string | null>(null);
   const [newBadges, setNewBadges] = useState<string[]>([]);
   const [showBadgeModal, setShowBadgeModal] = useState(false);
+  // Identifica a rodada: reenvios (retry) do mesmo submit não pontuam duas vezes
+  const [roundId] = useState(() => crypto.randomUUID());
+  // Feedback da IA chega via SSE depois do resultado da rodada
+  const [streamedFeedback, setStreamedFeedback] = useState('');
+  const feedbackSource = useRef<EventSource | null>(null);
+
+  useEffect(() => () => feedbackSource.current?.close(), []);
+
+  const streamFeedback = (streamId: string) => {
+    const source = new EventSource(`http://localhost:5000/api/activities/feedback/${streamId}`);
+    feedbackSource.current = source;
+    source.onmessage = (e) => {
+      const { delta } = JSON.parse(e.data);
+      if (delta) setStreamedFeedback(prev => prev + delta);
+    };
+    source.addEventListener('done', (e) => {
+      const { text } = JSON.parse((e as MessageEvent).data);
+      if (text) setStreamedFeedback(text);
+      source.close();
+    });
+    source.addEventListener('error', () => source.close());
+  };
 
   useEffect(() => {
     const fetchQuestions = async () => {
@@ -48,7 +70,7 @@ const ActivitiesPage: React.FC<ActivitiesPageProps> = ({ user, setUser, setCurre
         const res = await fetch('http://localhost:5000/api/activities/submit', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ user_id: user.id, answers: finalAnswers })
+            body: JSON.stringify({ user_id: user.id, answers: finalAnswers, round_id: roundId })
         });
         const result = await res.json();
         
@@ -69,6 +91,8 @@ const ActivitiesPage: React.FC<ActivitiesPageProps> = ({ user, setUser, setCurre
             ai_feedback: result.ai_feedback,
             correction_details: result.correction_details // Guarda o gabarito oficial
         });
+
+        if (!result.ai_feedback && result.feedback_stream_id) streamFeedback(result.feedback_stream_id);
     } catch (error) { console.error(error); } finally { setLoading(false); }
   };
   
@@ -100,7 +124,7 @@ const ActivitiesPage: React.FC<ActivitiesPageProps> = ({ user, setUser, setCurre
                     </div>
                     <h2 className="text-3xl font-bold text-white mb-2">Atividade Concluída</h2>
                     <p className="text-5xl font-extrabold mb-4" style={{color: '#8B5CF6'}}>{quizFinished.accuracy.toFixed(0)}%</p>
-                    {quizFinished.ai_feedback && <div className="mt-6 p-4 rounded-lg border border-indigo-500/30 bg-indigo-900/20 text-left"><div className="flex items-center gap-2 mb-2 text-indigo-400"><Sparkles size={20} /><span className="font-bold text-xs uppercase tracking-wider">Análise da IA</span></div><p className="text-gray-200 italic text-sm">"{quizFinished.ai_feedback}"</p></div>}
+                    {(quizFinished.ai_feedback || streamedFeedback) && <div className="mt-6 p-4 rounded-lg border border-indigo-500/30 bg-indigo-900/20 text-left"><div className="flex items-center gap-2 mb-2 text-indigo-400"><Sparkles size={20} /><span className="font-bold text-xs uppercase tracking-wider">Análise da IA</span></div><p className="text-gray-200 italic text-sm">"{quizFinished.ai_feedback || streamedFeedback}"</p></div>}
                 </div>
 
                 <div className="space-y-4">
@@ -36,6 +36,7 @@ export interface QuizResult {
     nextLevel: 'fácil' | 'médio' | 'difícil';
     newScore: number;
     ai_feedback?: string;
+    feedback_stream_id?: string;
     new_achievements?: string[];
     correction_details?: CorrectionDetail[];
 }